@@ -5,7 +5,8 @@ CONFIG_DICT = {
     "CONFIG_WRAPPIXELVALUES" : False,
     "CONFIG_MEDIA_PATH" : "",
     "CONFIG_SESSION_PATH" : "",
-    "CONFIG_JES4PY_PATH" : ""
+    "CONFIG_JES4PY_PATH" : "",
+    "CONFIG_PICTURE_CACHE_BYTES" : 0
     }
 CONFIG_FILENAME = ".jes4pyconf"
 
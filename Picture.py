@@ -1,11 +1,18 @@
-import os, sys
+import os, sys, math, time
 import wx
 import atexit
-import subprocess, tempfile, pickle
+import subprocess, tempfile, pickle, weakref
+from collections import OrderedDict
 from subprocess import PIPE
-import PIL.ImageDraw, PIL.Image
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import PIL.ImageDraw, PIL.Image, PIL.ImageFont
+import numpy as np
 from jes4py import Config
-from jes4py.PixelColor import Pixel, Color
+from jes4py.PixelColor import Pixel, PixelCursor, PixelSequence, Color
+from jes4py.PixelTrace import TraceError, tracePixelFunction, applyTrace
+from jes4py.PictureDrawing import PictureDrawing
+from jes4py.TextStyle import TextStyle
 from jes4py import FileChooser
 
 class Picture:
@@ -19,9 +26,47 @@ class Picture:
     subprocessList = []
     show_control_exit = bytes([0])
     show_control_data = bytes([1])
+    show_control_frame = bytes([2])
+    show_control_rects = bytes([3])
+    show_frame_header = 64
+    _frameMemory = None
+    _frameSegments = None
+    _frameShape = None
+    _dirtyRects = None
+    _dirtyCells = None
+    _image = None
+    _array = None
+    _arrayStale = False
+    _imageStale = False
+    _arrayExported = False
+    _access = None
+    _writeAccess = None
+    _tracing = False
+    _lazyFileName = None
+    _headerSize = None
+    _headerFormat = None
+    _lazyTargetSize = None
+    _pyramid = None
+    _pyramidEnabled = False
+    _views = ()
+    _displayList = None
+    _sceneBase = None
+    _sceneDrawn = None
+    _sceneCount = None
+    _scenePending = False
+    _imageShared = False
+    _cache = OrderedDict()
+    _cacheBytes = 0
+    _cacheHits = 0
+    _cacheMisses = 0
 
     def __init__(self, *args, **kwargs):
         """Initializer for Picture class
+
+        When a filename is given together with lazy=True, only the image
+        header is read; the pixel data is decoded when it is first needed.
+        A filename may also be given with size=(width, height) or
+        maxDimension=n to load a reduced picture (see loadOrFail).
         """
         self.filename = self.title = 'None'
         if len(args) == 0:
@@ -36,15 +81,24 @@ class Picture:
                     filepath = FileChooser.getMediaPath(self.filename)
                     if os.path.isfile(filepath):
                         self.filename = self.title = filepath
+                size = kwargs.get("size")
+                maxDimension = kwargs.get("maxDimension")
                 try:
-                    self.image = PIL.Image.open(self.filename)
+                    if kwargs.get("lazy", False):
+                        self._openLazily(self.filename, size, maxDimension)
+                    elif size is not None or maxDimension is not None:
+                        self.image = self._decodeScaled(self.filename, size,
+                            maxDimension)
+                    else:
+                        self.image = PIL.Image.open(self.filename)
                 except:
                     self.image = PIL.Image.new("RGB", (600, 200))
                     draw = PIL.ImageDraw.Draw(self.image)
                     draw.text((0, 100), "Couldn't load " + self.filename)
             elif isinstance(args[0], Picture):
-                # We've been passed a Picture object
-                self.image = args[0].image.copy()
+                # We've been passed a Picture object; share its image
+                # until one of the pictures changes it
+                self._shareImage(args[0])
                 self.filename = args[0].filename
                 self.title = args[0].title
             elif isinstance(args[0], PIL.Image.Image):
@@ -71,7 +125,7 @@ class Picture:
             representation of this picture
         """
         output = "Picture, filename {} height {} width {}".format(
-            self.filename, self.image.height, self.image.width)
+            self.filename, self.getHeight(), self.getWidth())
         return output
 
     def __repr__(self):
@@ -84,6 +138,472 @@ class Picture:
         """
         return self.__str__()
 
+    @property
+    def image(self):
+        """The PIL Image holding this picture's pixels
+
+        Pending writes made through the pixel array are copied into the
+        image first.  Since the caller may modify the returned image, an
+        image shared with other pictures is copied first, and the pixel
+        array is refreshed from the image on its next use.
+        """
+        return self._drawingImage()
+
+    def _drawingImage(self, box=None):
+        """Return the PIL Image for changing part of it
+
+        Does what the image property does, and records the region that
+        will change for the next repaint().
+
+        Parameters
+        ----------
+        box : tuple of int
+            left, top, right and bottom (exclusive) of the region that
+            will change, or None if any part may change
+
+        Returns
+        -------
+        PIL.Image.Image
+            the up-to-date PIL Image
+        """
+        image = self._syncImage()
+        if self._imageShared:
+            image = self._image = image.copy()
+            self._imageShared = False
+        self._pyramid = None
+        self._sceneDrawn = None
+        if self._array is not None:
+            self._arrayStale = True
+            self._access = None
+            self._dropViewHandles()
+        self._markDirty(box)
+        return image
+
+    @image.setter
+    def image(self, image):
+        self._dirtyRects = None
+        self._image = image
+        self._imageShared = False
+        self._lazyFileName = None
+        self._pyramid = None
+        self._sceneDrawn = None
+        self._array = None
+        self._arrayStale = self._imageStale = self._arrayExported = False
+        self._access = self._writeAccess = None
+        self._dropViewHandles()
+
+    def _markDirty(self, box):
+        """Record a region that has changed since the last repaint()
+
+        Regions are only recorded for pictures that are being shown.
+
+        Parameters
+        ----------
+        box : tuple of int
+            left, top, right and bottom (exclusive) of the region, or None
+            if the whole picture may have changed
+        """
+        rects = self._dirtyRects
+        if rects is not None:
+            if box is None or len(rects) >= 64:
+                self._dirtyRects = None
+            else:
+                rects.append(box)
+
+    def __getstate__(self):
+        """Return state for pickling, leaving out the pixel access handles
+
+        Returns
+        -------
+        dict
+            the picture's attributes
+        """
+        if self._arrayExported:
+            self._syncImage()
+        state = self.__dict__.copy()
+        state["_access"] = state["_writeAccess"] = None
+        state["_arrayExported"] = False
+        state.pop("_pyramid", None)
+        state.pop("_views", None)
+        state.pop("_frameMemory", None)
+        state.pop("_frameSegments", None)
+        return state
+
+    def _syncImage(self):
+        """Return the PIL Image after copying in pending pixel array writes
+
+        Unlike the image property this does not invalidate the pixel
+        array, so it should only be used when the image is just read.
+        Once getArray() or setArray() has handed the pixel array out, it
+        may have been written at any time, so the image is rebuilt from it
+        unless the image has been changed since the array was last used.
+
+        Returns
+        -------
+        PIL.Image.Image
+            the up-to-date PIL Image
+        """
+        if self._image is None:
+            self.ensureLoaded()
+        if self._views:
+            self._flushViews()
+        if self._scenePending:
+            self._rasterizeScene()
+        if self._arrayExported and not self._arrayStale:
+            self._imageStale = True
+            self._pyramid = self._sceneDrawn = None
+        if self._imageStale:
+            image = PIL.Image.fromarray(self._array)
+            if image.readonly:
+                # RGBA images are made over the array's memory; the image
+                # may be shared with other pictures, so it needs its own
+                image = image.copy()
+            self._image = image
+            self._imageShared = self._imageStale = False
+            self._writeAccess = None
+            self._dropViewHandles()
+        return self._image
+
+    def _readArray(self):
+        """Return the pixel array, creating or refreshing it if needed
+
+        Returns
+        -------
+        numpy.ndarray
+            uint8 array of shape (height, width, channels)
+        """
+        if self._tracing:
+            raise TraceError("pixel data cannot be read while tracing")
+        if self._views:
+            self._flushViews()
+        if self._scenePending:
+            self._rasterizeScene()
+        if self._array is None:
+            self.ensureLoaded()
+            if self._image.mode not in ("RGB", "RGBA"):
+                self._image = self._image.convert("RGB")
+                self._imageShared = False
+            self._array = np.array(self._image)
+        elif self._arrayStale:
+            self._array[...] = np.asarray(self._image)
+        self._arrayStale = False
+        return self._array
+
+    def _writeArray(self):
+        """Return the pixel array for writing
+
+        Marks the PIL Image as out of date so that it is rebuilt from the
+        array the next time it is needed, and the whole picture as changed
+        since the last repaint().
+
+        Returns
+        -------
+        numpy.ndarray
+            uint8 array of shape (height, width, channels)
+        """
+        array = self._readArray()
+        self._imageStale = True
+        self._pyramid = self._sceneDrawn = None
+        self._markDirty(None)
+        return array
+
+    def _pixelAccess(self):
+        """Return handle for reading pixel levels
+
+        The handle is a memoryview of the pixel array indexed by
+        [y, x, channel].  It is cached, and dropped whenever the array
+        goes out of date, so Pixel uses the cached handle when it is set
+        and calls this method otherwise.
+
+        Returns
+        -------
+        memoryview
+            view of the pixel array
+        """
+        if self._access is None:
+            self._access = memoryview(self._readArray())
+        return self._access
+
+    def _pixelWriteAccess(self, x=0, y=0):
+        """Return handle for writing pixel levels
+
+        Like _pixelAccess(), but also marks the PIL Image as out of date.
+        The handle is cached until the image is next brought up to date,
+        except while changed regions are being recorded for repaint():
+        then every write comes here and records the cell of the picture
+        it is in.
+
+        Parameters
+        ----------
+        x : int
+            the x-coord of the pixel that will be written
+        y : int
+            the y-coord of the pixel that will be written
+
+        Returns
+        -------
+        memoryview
+            view of the pixel array
+        """
+        access = self._pixelAccess()
+        self._imageStale = True
+        self._pyramid = self._sceneDrawn = None
+        if self._dirtyRects is None:
+            self._writeAccess = access
+        else:
+            self._dirtyCells.add((y >> _cellShift, x >> _cellShift))
+        return access
+
+    def getArray(self):
+        """Return the pixel data of this picture as a NumPy array
+
+        The array is the picture's own pixel buffer, not a copy: changes
+        made to it at any time show up in the picture and its pixels.
+        Drawing methods and getImage() work on the PIL Image, so call
+        getArray() again after using them before writing to the array;
+        writes made before that are replaced by the drawing.
+
+        Returns
+        -------
+        numpy.ndarray
+            uint8 array of shape (height, width, 3), or (height, width, 4)
+            for pictures with an alpha channel
+        """
+        array = self._writeArray()
+        self._arrayExported = True
+        return array
+
+    def setArray(self, array):
+        """Use a NumPy array as the pixel data of this picture
+
+        The array is adopted without copying, so later changes to it show
+        up in the picture.
+
+        Parameters
+        ----------
+        array : numpy.ndarray
+            uint8 array of shape (height, width, 3) or (height, width, 4)
+        """
+        if not isinstance(array, np.ndarray) or array.dtype != np.uint8 \
+                or array.ndim != 3 or array.shape[2] not in (3, 4):
+            print("setArray(array): Input is not a uint8 array of shape (height, width, 3 or 4)")
+            raise ValueError
+        self.image = PIL.Image.fromarray(array)
+        self._array = array
+        self._imageStale = self._arrayExported = True
+
+    def view(self, upperLeftX, upperLeftY, width, height):
+        """Return a picture showing part of this picture without copying it
+
+        The view shares its pixels with this picture: changes made through
+        either one show up in both.  Use detach() to get an independent
+        copy of the region.
+
+        Parameters
+        ----------
+        upperLeftX : int
+            the x-coord of the upper-left corner of the region
+        upperLeftY : int
+            the y-coord of the upper-left corner of the region
+        width : int
+            the width of the region
+        height : int
+            the height of the region
+
+        Returns
+        -------
+        PictureView
+            a picture for the region
+        """
+        if upperLeftX < 0 or upperLeftY < 0 or width < 1 or height < 1 \
+                or upperLeftX + width > self.getWidth() \
+                or upperLeftY + height > self.getHeight():
+            print("view(upperLeftX, upperLeftY, width, height): region is not within the picture")
+            raise ValueError
+        return PictureView(self, int(upperLeftX), int(upperLeftY),
+            int(width), int(height))
+
+    def detach(self):
+        """Return a copy of this picture that does not share its pixels
+
+        For a view this copies the region it shows; for other pictures it
+        is the same as Picture(picture), which shares the image until one
+        of the pictures is changed.
+
+        Returns
+        -------
+        Picture
+            the copy
+        """
+        return Picture(self)
+
+    def _dropViewHandles(self):
+        """Drop the cached pixel access handles of views of this picture"""
+        for view in self._views:
+            view._access = view._writeAccess = None
+
+    def _flushViews(self):
+        """Copy drawing done on views of this picture into this picture
+
+        Pending drawing is written into the pixel array if it is up to
+        date, and pasted into the image otherwise.
+        """
+        for view in list(self._views):
+            if not view._arrayStale:
+                continue
+            image, view._image = view._image, None
+            view._arrayStale = False
+            x, y, width, height = view._box
+            if self._array is not None and not self._arrayStale:
+                region = self._array[y:y+height, x:x+width]
+                mode = "RGBA" if region.shape[2] == 4 else "RGB"
+                region[...] = np.asarray(image.convert(mode))
+                self._imageStale = True
+            else:
+                if self._imageShared:
+                    self._image = self._image.copy()
+                    self._imageShared = False
+                self._image.paste(image, (x, y))
+            self._pyramid = self._sceneDrawn = None
+            self._markDirty((x, y, x + width, y + height))
+
+    def _openLazily(self, fileName, size=None, maxDimension=None):
+        """Read the header of an image file and defer decoding its pixels
+
+        Parameters
+        ----------
+        fileName : str
+            the name of the file to load the picture from
+        size : tuple of int
+            the size to decode the picture at, or None
+        maxDimension : int
+            the largest width or height to decode the picture at, or None
+        """
+        with PIL.Image.open(fileName) as image:
+            fullSize, format = image.size, image.format
+        targetSize = self._scaledSize(fullSize, size, maxDimension)
+        self.image = None
+        self._lazyFileName = fileName
+        self._lazyTargetSize = targetSize
+        self._headerSize = targetSize or fullSize
+        self._headerFormat = format
+
+    @staticmethod
+    def _scaledSize(fullSize, size=None, maxDimension=None):
+        """Return the size to decode an image at
+
+        Parameters
+        ----------
+        fullSize : tuple of int
+            the width and height of the image in the file
+        size : tuple of int
+            the width and height wanted, or None
+        maxDimension : int
+            the largest width or height wanted, or None; images that are
+            already small enough are not enlarged
+
+        Returns
+        -------
+        tuple of int
+            the width and height to decode at, or None for the full size
+        """
+        if size is not None:
+            if len(size) != 2 or size[0] < 1 or size[1] < 1:
+                print("Picture(filename, size): size is not a (width, height) pair of positive integers")
+                raise ValueError
+            size = (int(size[0]), int(size[1]))
+        elif maxDimension is not None:
+            if maxDimension < 1:
+                print("Picture(filename, maxDimension): maxDimension is not a positive integer")
+                raise ValueError
+            factor = maxDimension / max(fullSize)
+            if factor >= 1:
+                return None
+            size = (max(1, int(fullSize[0] * factor)),
+                max(1, int(fullSize[1] * factor)))
+        return None if size == fullSize else size
+
+    @staticmethod
+    def _decodeScaled(fileName, size=None, maxDimension=None):
+        """Decode an image file at a reduced size
+
+        JPEG files are decoded with Pillow's draft mode, which scales by
+        1/2, 1/4 or 1/8 while decoding, and other files are shrunk by an
+        integer factor with Image.reduce.  The result is then resampled to
+        the exact size wanted, so the full-size pixels are never resampled.
+
+        Parameters
+        ----------
+        fileName : str
+            the name of the image file
+        size : tuple of int
+            the width and height wanted, or None
+        maxDimension : int
+            the largest width or height wanted, or None
+
+        Returns
+        -------
+        PIL.Image.Image
+            the decoded image
+        """
+        image = PIL.Image.open(fileName)
+        targetSize = Picture._scaledSize(image.size, size, maxDimension)
+        if targetSize is None:
+            image.load()
+            return image
+        if image.format == "JPEG":
+            image.draft(None, targetSize)
+        image.load()
+        if image.mode not in ("RGB", "RGBA", "L"):
+            image = image.convert("RGB")
+        factor = min(image.width // targetSize[0],
+            image.height // targetSize[1])
+        if factor > 1:
+            image = image.reduce(factor)
+        if image.size != targetSize:
+            image = image.resize(targetSize)
+        return image
+
+    def isLoaded(self):
+        """Return whether the pixel data of this picture has been decoded
+
+        Only pictures opened with lazy=True start out unloaded.
+
+        Returns
+        -------
+        bool
+            True if the pixel data is in memory, False otherwise
+        """
+        return self._image is not None
+
+    def ensureLoaded(self):
+        """Decode the pixel data of a lazily opened picture
+
+        Does nothing if the pixel data is already loaded.  Pixel access,
+        drawing and writing call this as needed.
+        """
+        if self._image is None and self._lazyFileName is not None:
+            if self._lazyTargetSize is not None:
+                image = self._decodeScaled(self._lazyFileName,
+                    self._lazyTargetSize)
+            else:
+                image = PIL.Image.open(self._lazyFileName)
+                image.load()
+            self.image = image
+
+    def getFormat(self):
+        """Return the file format of this picture
+
+        Returns
+        -------
+        str
+            the PIL format name (e.g. "JPEG" or "PNG"), or None if the
+            picture was not read from a file
+        """
+        if self._image is None:
+            return self._headerFormat
+        return self._image.format
+
     def getExtension(self):
         """Return the filename extension for this picture
 
@@ -103,9 +623,23 @@ class Picture:
             the Picture object that self will look like
 
         """
-        im = PIL.Image.new("RGB", (self.getWidth(), self.getHeight()), (0,0,0))
-        im = sourcePicture.getImage().copy()
-        self.setImage(im)
+        self._shareImage(sourcePicture)
+
+    def _shareImage(self, source):
+        """Make this picture use the image of another picture
+
+        The image is shared copy-on-write: both pictures are marked so
+        that whichever changes it through the image property first makes
+        its own copy, and pixel writes already go to each picture's own
+        pixel array.
+
+        Parameters
+        ----------
+        source : Picture
+            the picture whose image is shared
+        """
+        self.image = source._syncImage()
+        self._imageShared = source._imageShared = True
 
     def setAllPixelsToAColor(self, acolor):
         """Makes the image associated with the picture filled in with one color
@@ -120,6 +654,158 @@ class Picture:
             raise ValueError
         self.image = PIL.Image.new("RGB", (self.getWidth(), self.getHeight()), acolor.getRGB())
 
+    def applyPixelFunction(self, func):
+        """Call a function on every pixel of the picture
+
+        Has the same effect as calling func on each pixel in getPixels(),
+        but first tries to trace func once with a stand-in pixel (see
+        PixelTrace) and apply what it does to the whole picture with array
+        operations.  Functions that cannot be traced, for example because
+        they branch on a level or call int() on one, are run on every
+        pixel as usual, and so are functions that use random numbers or
+        keep state between calls.  func may be called twice more than
+        usual while it is being traced, so it should only change the
+        pixel it is given.
+
+        Parameters
+        ----------
+        func : function
+            function taking a pixel
+
+        Returns
+        -------
+        bool
+            True if func was traced, False if it was run on every pixel
+        """
+        levels = tracePixelFunction(func, self)
+        if levels is not None:
+            try:
+                applyTrace(levels, self._readArray())
+            except (ArithmeticError, ValueError, TypeError):
+                # e.g. division by zero; running func on each pixel
+                # reports the error the way it normally would
+                pass
+            else:
+                self._writeArray()
+                return True
+        for pixel in self.getPixels():
+            func(pixel)
+        return False
+
+    def parallelMap(self, func, workers=None, channels=False):
+        """Call a function on every pixel using several processes
+
+        The picture is split into bands of rows that are handled by a pool
+        of worker processes.  The pixel data is placed in shared memory,
+        so it is not pickled, and the results are copied back into the
+        picture at the end.
+
+        func is either a pixel function like those for
+        applyPixelFunction(), or, if channels is True, a function taking
+        the red, green and blue levels and returning the new levels as a
+        tuple or Color.  A channel function is called once per distinct
+        color of each band.  func must be picklable, i.e. defined at the
+        top level of a module; other functions are run in this process.
+
+        Parameters
+        ----------
+        func : function
+            pixel function, or channel function if channels is True
+        workers : int
+            number of worker processes (default: number of CPUs)
+        channels : bool
+            True if func is a channel function
+        """
+        if workers is None:
+            workers = os.cpu_count() or 1
+        height = self.getHeight()
+        try:
+            pickle.dumps(func)
+        except Exception:
+            workers = 1
+        if workers <= 1 or height <= 1:
+            _mapRows(self._writeArray(), 0, height, func, channels)
+            return
+        array = self._readArray()
+        # a few bands per worker keeps the workers evenly loaded
+        bands = np.linspace(0, height, min(height, workers * 4) + 1).astype(int)
+        shm = shared_memory.SharedMemory(create=True, size=array.nbytes)
+        shared = None
+        try:
+            shared = np.ndarray(array.shape, dtype=np.uint8, buffer=shm.buf)
+            shared[...] = array
+            with ProcessPoolExecutor(max_workers=workers) as executor:
+                futures = [executor.submit(_mapSharedRows, shm.name,
+                        array.shape, top, bottom, func, channels,
+                        Pixel.getWrapLevels())
+                    for top, bottom in zip(bands[:-1], bands[1:])]
+                for future in futures:
+                    future.result()
+            self._writeArray()[...] = shared
+        finally:
+            shared = None
+            shm.close()
+            shm.unlink()
+
+    def mapChannels(self, redFunc=None, greenFunc=None, blueFunc=None):
+        """Transform each color channel of the picture with a function
+
+        Each function is called once for every level 0..255 to build a
+        lookup table, which is then applied to the whole picture in one
+        pass.  The results are mapped to [0..255] the same way the Pixel
+        setters do it, so they are clamped or wrapped according to
+        Pixel's wrapLevels setting.
+
+        Parameters
+        ----------
+        redFunc, greenFunc, blueFunc : function
+            function taking the old level of the channel and returning the
+            new level; a channel without a function is left unchanged
+        """
+        table = []
+        for func in (redFunc, greenFunc, blueFunc):
+            if func is None:
+                table.extend(range(256))
+            else:
+                table.extend(Pixel.correctLevel(func(level)) for level in range(256))
+        image = self._syncImage()
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGB")
+        if image.mode == "RGBA":
+            # leave the alpha channel unchanged
+            table.extend(range(256))
+        self.image = image.point(table)
+
+    def mapRed(self, func):
+        """Transform the red channel of the picture with a function
+
+        Parameters
+        ----------
+        func : function
+            function taking the old red level and returning the new one
+        """
+        self.mapChannels(redFunc=func)
+
+    def mapGreen(self, func):
+        """Transform the green channel of the picture with a function
+
+        Parameters
+        ----------
+        func : function
+            function taking the old green level and returning the new one
+        """
+        self.mapChannels(greenFunc=func)
+
+    def mapBlue(self, func):
+        """Transform the blue channel of the picture with a function
+
+        Parameters
+        ----------
+        func : function
+            function taking the old blue level and returning the new one
+        """
+        self.mapChannels(blueFunc=func)
+
     def getFileName(self):
         """Return picture file name
 
@@ -168,7 +854,9 @@ class Picture:
         int
             number of pixels in a row of this image
         """
-        return self.image.width
+        if self._image is None:
+            return self._headerSize[0]
+        return self._image.width
 
     def getHeight(self):
         """Return the height of the image in this picture
@@ -178,7 +866,9 @@ class Picture:
         int
             number of pixels in a column of this image
         """
-        return self.image.height
+        if self._image is None:
+            return self._headerSize[1]
+        return self._image.height
 
     def getImage(self):
         """Return the PIL Image associated with this picture
@@ -241,25 +931,213 @@ class Picture:
         Pixel
             the pixel at (x,y) in this picture
         """
-        pix = Pixel(self.image, x, y)
+        pix = Pixel(self, x, y)
         return pix
 
     def getPixels(self):
-        """Return list of pixels contained in picture
+        """Return sequence of pixels contained in picture
+
+        Returns all pixels in this picture as a flattened sequence.
+        Pixels are listed row-by-row.  The Pixel objects are created as
+        they are accessed rather than all at once.
+
+        Returns
+        -------
+        PixelSequence
+            sequence of pixels in this picture
+        """
+        return PixelSequence(self)
 
-        Returns a list of all pixels in this picture as a flattened array.
-        Pixels are listed row-by-row.
+    def iterPixels(self):
+        """Return iterator over the pixels using a single reusable cursor
+
+        Visits the pixels row-by-row like getPixels(), but yields the same
+        PixelCursor object each time, moved to the next position, so no
+        Pixel is created per iteration.  The cursor must not be kept
+        beyond the current iteration; use getPixel() or getPixels() for
+        pixels that need to be stored.
+
+        Returns
+        -------
+        iterator of PixelCursor
+            the cursor, positioned on each pixel in turn
+        """
+        cursor = PixelCursor(self, 0, 0)
+        width = self.getWidth()
+        for y in range(self.getHeight()):
+            cursor.y = y
+            for x in range(width):
+                cursor.x = x
+                yield cursor
+
+    def beginScene(self):
+        """Start recording drawing on this picture in a display list
+
+        The picture as it is now becomes the background of the scene.
+        While the scene is active, addLine, addRect, addOval, addArc,
+        addText and their filled versions record shapes instead of drawing
+        them; shapes entirely outside the picture are dropped.  The shapes
+        are drawn on the background when the picture's pixels are next
+        read, written out or shown, with consecutive lines of one color
+        joined into single polylines.
+
+        For animations, call newFrame() before recording each frame.  Only
+        the parts of the picture covered by shapes added or removed since
+        the last drawn frame are redrawn, so a mostly static scene is cheap
+        to redraw:
+
+            pic.beginScene()
+            for t in range(100):
+                pic.newFrame()
+                addRectFilled(pic, 10, 10, 50, 50, blue)
+                addOvalFilled(pic, t, 80, 20, 20, red)
+                repaint(pic)
+            pic.endScene()
+
+        Pixels changed directly while a scene is active (through pixels,
+        getImage or setImage) end up under the shapes recorded after them,
+        as if they were drawn immediately, but last only until the next
+        frame, which starts again from the background.
+        """
+        self._sceneBase = self._syncImage()
+        # the background is shared with the drawn picture until drawn on
+        self._imageShared = True
+        self._displayList = []
+        self._sceneDrawn = []
+        self._sceneCount = 0
+        self._scenePending = False
+
+    def newFrame(self):
+        """Clear the display list to record the next frame of a scene"""
+        if self._displayList is None:
+            print("newFrame(): no scene has been started")
+            raise ValueError
+        self._displayList = []
+        self._sceneCount = None
+        self._scenePending = True
+        self._access = self._writeAccess = None
+        self._dropViewHandles()
+
+    def endScene(self):
+        """Draw the recorded shapes and go back to drawing immediately"""
+        if self._scenePending:
+            self._rasterizeScene()
+        self._displayList = self._sceneBase = self._sceneDrawn = None
+        self._sceneCount = None
+
+    def _record(self, kind, rgb, coords, extra=None):
+        """Add a shape to the display list
+
+        Parameters
+        ----------
+        kind : str
+            the kind of shape, e.g. "line" or "rectFilled"
+        rgb : tuple of int
+            the color of the shape
+        coords : tuple
+            the points or bounding box of the shape
+        extra : tuple
+            angles for arcs, or text and font for text
+        """
+        shape = (kind, rgb, coords, extra)
+        bounds = _shapeBounds(shape)
+        width, height = self._sceneBase.size
+        if bounds[0] >= width or bounds[1] >= height \
+                or bounds[2] <= 0 or bounds[3] <= 0:
+            return
+        self._displayList.append((shape, bounds))
+        if not self._scenePending:
+            # make the next pixel access draw the scene
+            self._scenePending = True
+            self._access = self._writeAccess = None
+            self._dropViewHandles()
+
+    def _rasterizeScene(self):
+        """Draw the display list of the scene onto the picture's image
+
+        If part of the current frame has already been drawn, only the
+        shapes recorded since are drawn, over the picture as it is now, so
+        pixels changed in between are kept.  If the image holds the
+        previous frame and the shapes common to both frames are in the
+        same order, only the regions covered by shapes that were added or
+        removed are restored from the background and redrawn.  Otherwise
+        the whole frame is drawn on a copy of the background.
+        """
+        self._scenePending = False
+        entries = self._displayList
+        drawn = self._sceneDrawn
+        width, height = self._sceneBase.size
+        if self._sceneCount is not None:
+            image = self._syncImage()
+            if self._imageShared:
+                image = self._image = image.copy()
+                self._imageShared = False
+            added = entries[self._sceneCount:]
+            _drawShapes(PIL.ImageDraw.Draw(image), added)
+            for shape, bounds in added:
+                self._markDirty(_clipBounds(bounds, width, height))
+            if self._array is not None:
+                self._arrayStale = True
+            self._access = self._writeAccess = None
+            self._dropViewHandles()
+            self._pyramid = None
+            # pixels changed during the frame are not in the display list
+            self._sceneDrawn = None if drawn is None else list(entries)
+            self._sceneCount = len(entries)
+            return
+        dirty = None
+        if drawn is not None:
+            old, new = set(drawn), set(entries)
+            if [e for e in drawn if e in new] == [e for e in entries if e in old]:
+                dirty = [_clipBounds(bounds, width, height)
+                    for shape, bounds in drawn if (shape, bounds) not in new]
+                dirty += [_clipBounds(bounds, width, height)
+                    for shape, bounds in entries if (shape, bounds) not in old]
+                area = sum((b[2] - b[0]) * (b[3] - b[1]) for b in dirty)
+                if 2 * area > width * height:
+                    dirty = None
+        if dirty is None:
+            image = self._sceneBase.copy()
+            _drawShapes(PIL.ImageDraw.Draw(image), entries)
+            self._markDirty(None)
+        else:
+            image = self._image
+            if self._imageShared:
+                image = image.copy()
+            for box in dirty:
+                region = self._sceneBase.crop(box)
+                _drawShapes(PIL.ImageDraw.Draw(region), entries, box)
+                image.paste(region, box[:2])
+                self._markDirty(box)
+        self._image = image
+        self._imageShared = self._imageStale = False
+        if self._array is not None:
+            self._arrayStale = True
+        self._access = self._writeAccess = None
+        self._dropViewHandles()
+        self._pyramid = None
+        self._sceneDrawn = list(entries)
+        self._sceneCount = len(entries)
+
+    def drawing(self):
+        """Return a batch for drawing many shapes on this picture
+
+        Use as
+
+            with pic.drawing() as d:
+                d.addLine(red, 0, 0, 10, 10)
+                d.addLines(blue, segments)
+
+        The batch keeps one draw handle for all its shapes and also draws
+        whole arrays of lines, points, rectangles and ovals (see
+        PictureDrawing).
 
         Returns
         -------
-        list of Pixel
-            list of pixels in this picture
+        PictureDrawing
+            the drawing batch
         """
-        pixels = list()
-        for y in range(self.image.height):
-            for x in range(self.image.width):
-                pixels.append(Pixel(self.image, x, y))
-        return pixels
+        return PictureDrawing(self)
 
     def addLine(self, acolor, x1, y1, x2, y2):
         """Draw a line on this picture
@@ -275,8 +1153,11 @@ class Picture:
         y2 : int
             the y-coordinate of the second point
         """
-        draw = PIL.ImageDraw.Draw(self.image)
+        if self._displayList is not None:
+            self._record("line", acolor.getRGB(), (x1, y1, x2, y2))
+            return
         shape = [x1, y1, x2, y2]
+        draw = self._drawHandle(shape)
         draw.line(shape, fill=acolor.getRGB())
 
     def addText(self, acolor, x, y, string):
@@ -293,11 +1174,10 @@ class Picture:
         string : str
             the text that will be drawn on the picture
         """
-        draw = PIL.ImageDraw.Draw(self.image)
-        # font = ImageFont.truetype(<font-file>, <font-size>)
-        # font = ImageFont.truetype("sans-serif.ttf", 16)
-        # draw.text((x, y),"Sample Text",(r,g,b))
-        draw.text((x, y), string, acolor.getRGB())
+        if self._displayList is not None:
+            self._record("text", acolor.getRGB(), (x, y), (string, None))
+            return
+        self._drawText(acolor.getRGB(), x, y, string, None)
 
     def addTextWithStyle(self, acolor, x, y, string, style):
         """Add text to a picture withe a particular font style
@@ -312,15 +1192,57 @@ class Picture:
             the y-coordinate of the top left corner of the text
         string : str
             the text that will be drawn on the picture
-        style : ???
+        style : TextStyle
             the font style to be used
         """
-    #    draw = PIL.ImageDraw.Draw(self.image)
-    #    # font = ImageFont.truetype(<font-file>, <font-size>)
-    #    # font = ImageFont.truetype("sans-serif.ttf", 16)
-    #    # draw.text((x, y),"Sample Text",(r,g,b))
-    #    draw.text((x, y), string, acolor.getRGB())
-        print("This function is not yet implemented.")
+        if not isinstance(style, TextStyle):
+            print("addTextWithStyle(color, x, y, string, style): Last input is not a style")
+            raise ValueError
+        font = style.getFont()
+        if self._displayList is not None:
+            self._record("text", acolor.getRGB(), (x, y), (string, font))
+            return
+        self._drawText(acolor.getRGB(), x, y, string, font)
+
+    def _drawHandle(self, shape):
+        """Return an ImageDraw for drawing a shape on this picture
+
+        Parameters
+        ----------
+        shape : list
+            the bounding box or end points (x1, y1, x2, y2) of the shape
+
+        Returns
+        -------
+        PIL.ImageDraw.ImageDraw
+            draw handle for the picture's image
+        """
+        return PIL.ImageDraw.Draw(self._drawingImage(_boxBounds(shape)))
+
+    def _drawText(self, rgb, x, y, string, font):
+        """Draw text, reusing the rendering of strings drawn before
+
+        Parameters
+        ----------
+        rgb : tuple of int
+            the color of the text
+        x, y : int
+            the top left corner of the text
+        string : str
+            the text
+        font : PIL.ImageFont.FreeTypeFont
+            the font, or None for Pillow's default font
+        """
+        bounds = _shapeBounds(("text", rgb, (x, y), (string, font)))
+        image = self._drawingImage(bounds)
+        if image.mode not in ("RGB", "RGBA") or type(x) is not int \
+                or type(y) is not int:
+            PIL.ImageDraw.Draw(image).text((x, y), string, rgb, font=font)
+            return
+        mask, (left, top) = TextStyle.renderText(string, font)
+        if mask is not None:
+            ink = rgb + (255,) if image.mode == "RGBA" else rgb
+            image.paste(ink, (x + left, y + top), mask)
 
     def addRect(self, acolor, x, y, w, h):
         """Draw the outline of a rectangle on this picture
@@ -336,8 +1258,11 @@ class Picture:
         h : int
             the height of the rectangle
         """
-        draw = PIL.ImageDraw.Draw(self.image)
+        if self._displayList is not None:
+            self._record("rect", acolor.getRGB(), (x, y, x+w, y+h))
+            return
         shape = [x, y, x+w, y+h]
+        draw = self._drawHandle(shape)
         draw.rectangle(shape, fill = None, outline = acolor.getRGB()) 
 
     def addRectFilled(self, acolor, x, y, w, h):
@@ -354,8 +1279,11 @@ class Picture:
         h : int
             the height of the rectangle
         """
-        draw = PIL.ImageDraw.Draw(self.image)
+        if self._displayList is not None:
+            self._record("rectFilled", acolor.getRGB(), (x, y, x+w, y+h))
+            return
         shape = [x, y, x+w, y+h]
+        draw = self._drawHandle(shape)
         color = acolor.getRGB()
         draw.rectangle(shape, fill = color, outline = color) 
 
@@ -373,8 +1301,11 @@ class Picture:
         h : int
             the height of the oval
         """
-        draw = PIL.ImageDraw.Draw(self.image)
+        if self._displayList is not None:
+            self._record("ovalFilled", acolor.getRGB(), (x, y, x+w, y+h))
+            return
         shape = [x, y, x+w, y+h]
+        draw = self._drawHandle(shape)
         color = acolor.getRGB()
         draw.ellipse(shape, fill=color, outline=color, width=1)
 
@@ -392,8 +1323,11 @@ class Picture:
         h : int
             the height of the oval
         """
-        draw = PIL.ImageDraw.Draw(self.image)
+        if self._displayList is not None:
+            self._record("oval", acolor.getRGB(), (x, y, x+w, y+h))
+            return
         shape = [x, y, x+w, y+h]
+        draw = self._drawHandle(shape)
         draw.ellipse(shape, fill=None, outline=acolor.getRGB(), width=1)
 
     def addArcFilled(self, acolor, x, y, w, h, start, angle):
@@ -414,13 +1348,16 @@ class Picture:
         angle : int
             the angle of the arc relative to start in degrees
         """
-        draw = PIL.ImageDraw.Draw(self.image)
         shape = [x, y, x+w, y+h]
         end = -start % 360
         start = -(start+angle) % 360
         if start > end:
             start, end = end, start
         color = acolor.getRGB()
+        if self._displayList is not None:
+            self._record("arcFilled", color, tuple(shape), (start, end))
+            return
+        draw = self._drawHandle(shape)
         draw.pieslice(shape, start, end, fill=color, outline=color, width=1)
 
     def addArc(self, acolor, x, y, w, h, start, angle):
@@ -441,19 +1378,25 @@ class Picture:
         angle : int
             the angle of the arc relative to start in degrees
         """
-        draw = PIL.ImageDraw.Draw(self.image)
         shape = [x, y, x+w, y+h]
         end = -start % 360
         start = -(start+angle) % 360
         if start > end:
             start, end = end, start
+        if self._displayList is not None:
+            self._record("arc", acolor.getRGB(), tuple(shape), (start, end))
+            return
+        draw = self._drawHandle(shape)
         draw.arc(shape, start, end, fill=acolor.getRGB(), width=1)
 
     def copyInto(self, dest, upperLeftX, upperLeftY):
         """Returns a picture with the current picture copied into it
 
         Copies the pixels in the current picture into the dest picture
-        starting at point (upperLeftX,upperLeftY)
+        starting at point (upperLeftX,upperLeftY).  The copy is done as a
+        single region paste.  Parts of the current picture that would fall
+        outside dest are left out, so the upper-left corner may also be
+        negative or beyond the edges of dest.
 
         Parameters
         ----------
@@ -471,26 +1414,18 @@ class Picture:
         Picture
             the dest picture that has self copied into it
         """
-        srcWidth = self.getWidth()
-        srcHeight = self.getHeight()
-        # # The next block of statments deal with cases where the self
-        # # picture would extend past the rigth or bottom border of the
-        # # destination picture. This is good, but an enhancement over
-        # # what JES does.  To make it useful we should also allow for
-        # # negative upperLeftX and upperLeftY values so the src picture
-        # # could extend past the left or top border.  Until this is done
-        # # we'll just leave this code disabled
-        # dstWidth = dest.getWidth()
-        # dstHeight = dest.getHeight()
-        # if upperLeftX + srcWidth >= dstWidth:
-        #     srcWidth = dstWidth - upperLeftX
-        # if upperLeftY + srcHeight >= dstHeight:
-        #     srcHeight = dstHeight - upperLeftY
-        for x in range(0, srcWidth):
-            for y in range(0, srcHeight):
-                srcPix = self.getPixel(x, y)
-                dstPix = dest.getPixel(x+upperLeftX, y+upperLeftY)
-                dstPix.setColor(srcPix.getColor())
+        # clip the destination region to all four edges of dest
+        left = max(upperLeftX, 0)
+        top = max(upperLeftY, 0)
+        right = min(upperLeftX + self.getWidth(), dest.getWidth())
+        bottom = min(upperLeftY + self.getHeight(), dest.getHeight())
+        if left >= right or top >= bottom:
+            # nothing of this picture lands inside dest
+            return dest
+        region = self._syncImage().crop((left - upperLeftX, top - upperLeftY,
+            right - upperLeftX, bottom - upperLeftY))
+        dest._drawingImage((left, top, right, bottom)).paste(region,
+            (left, top))
         return dest
 
     def crop(self, upperLeftX, upperLeftY, width, height):
@@ -515,24 +1450,37 @@ class Picture:
         Picture
             a cropped version of the picture
         """
-        croppedImage = self.image.crop((upperLeftX, upperLeftY, upperLeftX+width, upperLeftY+height))
-        pic = Picture(croppedImage)
-        pic.filename = self.filename
-        pic.title = self.title
-        return pic
-
-    def scale(self, xFactor, yFactor):
+        if upperLeftX < 0 or upperLeftY < 0 or width < 1 or height < 1 \
+                or upperLeftX + width > self.getWidth() \
+                or upperLeftY + height > self.getHeight():
+            # regions reaching outside the picture are padded with black
+            croppedImage = self._syncImage().crop((upperLeftX, upperLeftY, upperLeftX+width, upperLeftY+height))
+            pic = Picture(croppedImage)
+            pic.filename = self.filename
+            pic.title = self.title
+            return pic
+        return self.view(upperLeftX, upperLeftY, width, height).detach()
+
+    def scale(self, xFactor, yFactor, resample=None):
         """Create new scaled picture
 
         Method to create a new picture by scaling the current picture by
         the given x and y factors
 
+        Shrinking by exact integer factors (such as 0.5 or 0.25) with the
+        default or "box" filter averages blocks of pixels with
+        Image.reduce, which is much faster than resampling.  After
+        buildPyramid(), pictures are shrunk from the nearest pyramid level.
+
         Parameters
         ----------
         xFactor : float
             the amount to scale in x
         yFactor : float
             the amount to scale in y
+        resample : str
+            the filter to use: "nearest", "box", "bilinear", "bicubic" or
+            "lanczos"; None for Pillow's default
 
         Returns
         -------
@@ -540,13 +1488,100 @@ class Picture:
 
             a scaled version of the picture
         """
-        scaledImage = self.image.resize((int(self.image.width*xFactor), int(self.image.height*yFactor)))
+        if resample is not None:
+            if not isinstance(resample, str) or \
+                    resample.lower() not in _resampleFilters:
+                print("scale(xFactor, yFactor, resample): resample is not one of " + ", ".join(_resampleFilters))
+                raise ValueError
+            resample = resample.lower()
+        image = self._syncImage()
+        size = (int(image.width*xFactor), int(image.height*yFactor))
+        xReduce = _reduceFactor(xFactor)
+        yReduce = _reduceFactor(yFactor)
+        if self._pyramidEnabled:
+            # start from the smallest pyramid level still big enough
+            for level in self._pyramidLevels():
+                if level.width < size[0] or level.height < size[1]:
+                    break
+                image = level
+                xReduce = _reduceFactor(size[0] / level.width)
+                yReduce = _reduceFactor(size[1] / level.height)
+        # Image.reduce only handles 8-bit modes; others are resized as
+        # before
+        if resample in (None, "box") and xReduce and yReduce and \
+                image.mode in ("RGB", "RGBA", "L") and \
+                size[0] * xReduce <= image.width and \
+                size[1] * yReduce <= image.height and min(size) > 0:
+            box = (0, 0, size[0] * xReduce, size[1] * yReduce)
+            scaledImage = image.reduce((xReduce, yReduce), box)
+        elif resample is None:
+            scaledImage = image.resize(size)
+        else:
+            scaledImage = image.resize(size, _resampleFilters[resample])
         pic = Picture(scaledImage)
         pic.filename = self.filename
         pic.title = None
         return pic
 
-    def getPictureWithHeight(self, height):
+    def buildPyramid(self):
+        """Build a mipmap pyramid to speed up scaling this picture down
+
+        The pyramid holds copies of the picture at 1/2, 1/4, 1/8, ... of
+        its size, each averaged from the one before.  While it is in use,
+        scale, getPictureWithHeight and getPictureWithWidth shrink the
+        smallest level that is at least as big as the result instead of
+        the full picture.  Changing the picture through its pixels,
+        drawing methods or setImage discards the levels, and they are
+        rebuilt by the next scale.  Uses about a third of the memory of
+        the picture; call dropPyramid() to free it.
+        """
+        self._pyramidEnabled = True
+        self._pyramidLevels()
+
+    def dropPyramid(self):
+        """Free the mipmap pyramid and stop using it for scaling"""
+        self._pyramidEnabled = False
+        self._pyramid = None
+
+    def getPyramidBytes(self):
+        """Return the memory used by the mipmap pyramid
+
+        Returns
+        -------
+        int
+            the number of bytes of pixel data in the pyramid levels, 0 if
+            there is no pyramid
+        """
+        if self._pyramid is None:
+            return 0
+        return sum(level.width * level.height * len(level.getbands())
+            for level in self._pyramid)
+
+    def _pyramidLevels(self):
+        """Return the mipmap pyramid levels, building them if needed
+
+        Building the levels brings the image up to date and drops the
+        cached write handle, so the next pixel write discards them.
+
+        Returns
+        -------
+        list of PIL.Image.Image
+            the levels at 1/2, 1/4, ... of the picture's size
+        """
+        if self._pyramid is None or self._arrayExported:
+            image = self._syncImage()
+            if image.mode not in ("RGB", "RGBA", "L"):
+                image = image.convert("RGB")
+            levels = []
+            while image.width >= 2 and image.height >= 2:
+                image = image.reduce(2)
+                levels.append(image)
+            self._writeAccess = None
+            self._dropViewHandles()
+            self._pyramid = levels
+        return self._pyramid
+
+    def getPictureWithHeight(self, height, resample=None):
         """Returns a scaled version of this picture
 
         Scales the picture so that the height is equal to height while keeping
@@ -556,6 +1591,8 @@ class Picture:
         ----------
         height : int
             The height of the returned picture
+        resample : str
+            the filter to use (see scale)
 
         Returns
         -------
@@ -564,10 +1601,10 @@ class Picture:
         """
         # // set up the scale tranform
         yFactor = height / self.getHeight()
-        result = self.scale(yFactor, yFactor)
+        result = self.scale(yFactor, yFactor, resample)
         return result
         
-    def getPictureWithWidth(self, width):
+    def getPictureWithWidth(self, width, resample=None):
         """Returns a scaled version of this picture
 
         Scales the picture so that the width is equal to width while keeping
@@ -577,6 +1614,8 @@ class Picture:
         ----------
         width : int
             The width of the returned picture
+        resample : str
+            the filter to use (see scale)
 
         Returns
         -------
@@ -585,7 +1624,7 @@ class Picture:
         """
         # // set up the scale tranform
         xFactor = width / self.getWidth()
-        result = self.scale(xFactor, xFactor)
+        result = self.scale(xFactor, xFactor, resample)
         return result
 
     def loadPictureAndShowIt(self, fileName):
@@ -611,13 +1650,20 @@ class Picture:
 
         return result
 
-    def load(self, fileName):
+    def load(self, fileName, lazy=False, size=None, maxDimension=None):
         """Load picture from a file without throwing exceptions
 
         Parameters
         ----------
         fileName : str
             the name of the file to load the picture from
+        lazy : bool
+            if True, read only the header now and decode the pixel data
+            when it is first needed
+        size : tuple of int
+            the (width, height) to load the picture at, or None
+        maxDimension : int
+            the largest width or height to load the picture at, or None
 
         Returns
         -------
@@ -625,7 +1671,7 @@ class Picture:
             True if success else False
         """
         try:
-            self.loadOrFail(fileName)
+            self.loadOrFail(fileName, lazy, size, maxDimension)
             return True
         except BaseException:
             print("There was an error trying to open " + fileName)
@@ -635,18 +1681,123 @@ class Picture:
             self.addMessage("Couldn't load " + fileName, 5, 100)
             return False
 
-    def loadOrFail(self, fileName):
+    def loadOrFail(self, fileName, lazy=False, size=None, maxDimension=None):
         """Load a picture from a file
 
+        Decoded images can be kept in a process-wide cache, so loading the
+        same unchanged file again shares the decoded image instead of
+        reading the file.  The cache is off by default; set the
+        CONFIG_PICTURE_CACHE_BYTES configuration value to the number of
+        bytes it may use to turn it on, e.g. with
+        Config.setConfigVal("CONFIG_PICTURE_CACHE_BYTES", 64 * 1024 * 1024).
+
+        Giving size or maxDimension loads a reduced picture without
+        decoding the file at full size where the format allows it, which is
+        much faster than loading and then scaling large JPEG files.
+        Reduced pictures are not cached.
+
         Parameters
         ----------
         fileName : str
             the name of the file to load the picture from
+        lazy : bool
+            if True, read only the header now and decode the pixel data
+            when it is first needed
+        size : tuple of int
+            the (width, height) to load the picture at, or None
+        maxDimension : int
+            the largest width or height to load the picture at, or None;
+            smaller pictures are loaded at their full size
         """
-        self.image = PIL.Image.open(fileName) #.convert('RGB')
+        scaled = size is not None or maxDimension is not None
+        image = None if scaled else self._loadCached(fileName, lazy)
+        if image is not None:
+            # share the cached image; it is copied before any change
+            self.image = image
+            self._imageShared = True
+        elif lazy:
+            self._openLazily(fileName, size, maxDimension)
+        elif scaled:
+            self.image = self._decodeScaled(fileName, size, maxDimension)
+        else:
+            self.image = PIL.Image.open(fileName) #.convert('RGB')
         self.filename = self.title = fileName
 
 
+    @classmethod
+    def _loadCached(cls, fileName, lazy=False):
+        """Return the decoded image for a file from the picture cache
+
+        Decodes the file and adds it to the cache if it is not there (or
+        the file has changed), evicting the least recently used images to
+        stay within the byte budget.  Lazy loads (see loadOrFail) only use
+        images that are already cached.
+
+        Parameters
+        ----------
+        fileName : str
+            the name of the image file
+        lazy : bool
+            if True, do not decode the file if it is not cached
+
+        Returns
+        -------
+        PIL.Image.Image
+            the cached image, which must not be changed, or None if the
+            cache is disabled, the image does not fit in it, or the load is
+            lazy and the image is not cached
+        """
+        budget = Config.getConfigVal("CONFIG_PICTURE_CACHE_BYTES")
+        if budget <= 0:
+            return None
+        path = os.path.abspath(fileName)
+        stat = os.stat(path)
+        stamp = (stat.st_mtime_ns, stat.st_size)
+        cache = Picture._cache
+        entry = cache.get(path)
+        if entry is not None:
+            if entry[0] == stamp:
+                cache.move_to_end(path)
+                Picture._cacheHits += 1
+                return entry[1]
+            # file has changed since it was cached
+            del cache[path]
+            Picture._cacheBytes -= entry[2]
+        Picture._cacheMisses += 1
+        if lazy:
+            return None
+        image = PIL.Image.open(path)
+        nbytes = image.width * image.height * len(image.getbands())
+        if nbytes > budget:
+            image.close()
+            return None
+        image.load()
+        cache[path] = (stamp, image, nbytes)
+        Picture._cacheBytes += nbytes
+        while Picture._cacheBytes > budget:
+            stamp, old, oldBytes = cache.popitem(last=False)[1]
+            Picture._cacheBytes -= oldBytes
+        return image
+
+    @classmethod
+    def clearPictureCache(cls):
+        """Empty the process-wide cache of decoded images"""
+        Picture._cache.clear()
+        Picture._cacheBytes = 0
+
+    @classmethod
+    def getPictureCacheStats(cls):
+        """Return statistics about the cache of decoded images
+
+        Returns
+        -------
+        dict
+            "hits" and "misses" since the program started, and the current
+            number of "entries" and "bytes" in the cache
+        """
+        return {"hits": Picture._cacheHits, "misses": Picture._cacheMisses,
+            "entries": len(Picture._cache), "bytes": Picture._cacheBytes}
+
     def write(self, fileName):
         """Writes this picture to a file with the name fileName
 
@@ -687,7 +1838,7 @@ class Picture:
             print('imageType = {}'.format(imageType))
  
         # write file
-        self.image.save(fileName, format=imageType)
+        self._syncImage().save(fileName, format=imageType)
 
     def setMediaPath(self, directory):
         """Method to set the directory for the media
@@ -777,16 +1928,15 @@ class Picture:
         wx.Image
             the converted image
         """
-        orig_width, orig_height = self.image.size
+        image = self._syncImage()
+        orig_width, orig_height = image.size
         wx_img = wx.Image(orig_width, orig_height)
-        wx_img.SetData(self.image.convert('RGB').tobytes())
-
-        if copy_alpha and (self.image.mode[-1] == 'A'):
-            alpha = self.image.getchannel("A").tobytes()
-            wx_img.InitAlpha()
-            for i in range(orig_width):
-                for j in range(orig_height):
-                    wx_img.SetAlpha(i, j, alpha[i + j * orig_width])
+        rgb = image if image.mode == 'RGB' else image.convert('RGB')
+        wx_img.SetData(rgb.tobytes())
+
+        if copy_alpha and (image.mode[-1] == 'A'):
+            # set the whole alpha plane at once from its bytes
+            wx_img.SetAlpha(image.getchannel("A").tobytes())
         return wx_img
 
     def __saveInTempFile(self):
@@ -855,13 +2005,197 @@ class Picture:
         self.process.stdin.write(pkg)
         self.process.stdin.flush()
 
+    def __frameBuffer(self, nbytes):
+        """Return shared memory for sending frames of nbytes to "show"
+
+        The buffer is kept between frames and replaced when the picture
+        no longer fits in it.  It starts with a header of
+        show_frame_header bytes holding unsigned 64-bit fields: the number
+        of frames written, which is odd while a frame is being written,
+        and the time.monotonic_ns() the last frame was written at,
+        followed by the statistics the show process writes (see
+        getShowStats) and, last, a flag the show process sets once it has
+        mapped the buffer.  Replaced buffers are only unlinked after that,
+        since the show process may still be about to map them; all of
+        them are unlinked when the picture is garbage collected or the
+        program exits.
+
+        Parameters
+        ----------
+        nbytes : int
+            the size of the pixel data
+
+        Returns
+        -------
+        multiprocessing.shared_memory.SharedMemory
+            the buffer
+        """
+        shm = self._frameMemory
+        if shm is None or shm.size < self.show_frame_header + nbytes:
+            shm = shared_memory.SharedMemory(create=True,
+                size=self.show_frame_header + nbytes)
+            if self._frameSegments is None:
+                self._frameSegments = []
+                weakref.finalize(self, _releaseFrameMemory,
+                    self._frameSegments)
+            if self._frameMemory is not None:
+                # keep the statistics until the show process writes them
+                np.ndarray((7,), dtype=np.uint64, buffer=shm.buf)[2:] = \
+                    np.ndarray((7,), dtype=np.uint64,
+                    buffer=self._frameMemory.buf)[2:]
+            self._frameSegments.append(shm)
+            self._frameMemory = shm
+        elif len(self._frameSegments) > 1 and \
+                np.ndarray((8,), dtype=np.uint64, buffer=shm.buf)[7]:
+            self.__releaseOldFrames()
+        return shm
+
+    def __releaseOldFrames(self):
+        """Unlink the frame buffers replaced by the current one"""
+        segments = self._frameSegments
+        if segments is not None and len(segments) > 1:
+            old = segments[:-1]
+            del segments[:-1]
+            _releaseFrameMemory(old)
+
+    def __sendFrame(self):
+        """Send the picture to the "show" process through shared memory
+
+        The pixels are copied into a shared memory buffer that the show
+        process maps, and only the buffer's name, the picture's size and
+        its title go through the pipe.  When the show process already has
+        the previous frame, only the rectangles changed since then by
+        drawing, copyInto and pixel writes are copied and sent.  Pixel
+        writes are recorded by the 64 x 64 cell of the picture they fall
+        in.  Falls
+        back to sending the pickled picture if shared memory is not
+        available.
+        """
+        array = self._readArray()
+        height, width, channels = array.shape
+        try:
+            shm = self.__frameBuffer(array.nbytes)
+        except OSError:
+            self.__sendPickledPicture()
+            return
+        header = np.ndarray((2,), dtype=np.uint64, buffer=shm.buf)
+        count = header[:1]
+        pixels = np.ndarray(array.shape, dtype=np.uint8, buffer=shm.buf,
+            offset=self.show_frame_header)
+        rects = self.__changedRects(array, pixels, shm)
+        count[0] += 1
+        header[1] = time.monotonic_ns()
+        if rects is None:
+            pixels[...] = array
+        else:
+            for left, top, right, bottom in rects:
+                pixels[top:bottom, left:right] = array[top:bottom, left:right]
+        count[0] += 1
+        self._frameShape = (shm.name, array.shape)
+        self._dirtyRects = []
+        self._dirtyCells = set()
+        # make pixel setters record the cells they write from now on
+        self._writeAccess = None
+        for view in self._views:
+            view._writeAccess = None
+        if rects is None:
+            control = self.show_control_frame
+            pkg = pickle.dumps((shm.name, width, height, channels,
+                int(count[0]), self.getTitle()))
+        else:
+            control = self.show_control_rects
+            pkg = pickle.dumps((shm.name, width, height, channels,
+                int(count[0]), self.getTitle(), rects))
+        pkgSize = len(pkg).to_bytes(8, byteorder='big')
+        self.process.stdin.write(control)
+        self.process.stdin.write(pkgSize)
+        self.process.stdin.write(pkg)
+        self.process.stdin.flush()
+
+    def __changedRects(self, array, pixels, shm):
+        """Return the rectangles changed since the last frame was sent
+
+        Parameters
+        ----------
+        array : numpy.ndarray
+            the picture's pixel array
+        pixels : numpy.ndarray
+            the pixels of the last frame in shared memory
+        shm : multiprocessing.shared_memory.SharedMemory
+            the shared memory the frame is sent in
+
+        Returns
+        -------
+        list of tuple
+            left, top, right and bottom (exclusive) of each changed
+            rectangle, or None if the whole frame should be sent
+        """
+        height, width, channels = array.shape
+        rects = self._dirtyRects
+        # rectangles with alpha would be blended over the old frame
+        if rects is None or channels == 4 \
+                or self._frameShape != (shm.name, array.shape):
+            return None
+        rects = [_clipBounds(box, width, height) for box in rects]
+        cells = self._dirtyCells
+        if self._arrayExported:
+            # arrays returned by getArray() may be written at any time
+            # without the picture knowing, so compare them with the last
+            # frame, cell by cell
+            size = 1 << _cellShift
+            changed = np.any(array != pixels, axis=2)
+            changed = np.logical_or.reduceat(changed,
+                np.arange(0, height, size), axis=0)
+            changed = np.logical_or.reduceat(changed,
+                np.arange(0, width, size), axis=1)
+            cells = cells.union(map(tuple, np.argwhere(changed).tolist()))
+        rects += _cellRects(cells, width, height)
+        rects = [box for box in rects if box[0] < box[2] and box[1] < box[3]]
+        area = sum((b[2] - b[0]) * (b[3] - b[1]) for b in rects)
+        if 2 * area > width * height:
+            return None
+        return rects
+
+    def getShowStats(self):
+        """Return statistics about the frames shown by show() and repaint()
+
+        The show process draws only the newest frame when frames arrive
+        faster than it can draw them, and counts the others as dropped.
+        The counts are kept by the show process and written to the frame
+        buffer after each frame it displays; they are copied over when the
+        buffer is replaced, for example when the picture's size changes,
+        so they cover everything since the show window was opened.  A new
+        window, opened when the old one was closed, starts counting again.
+
+        Returns
+        -------
+        dict
+            the numbers of frames "received", "displayed" and "dropped" by
+            the show process, and the "latency" in seconds from sending to
+            displaying the last frame displayed and its "meanLatency" over
+            all displayed frames; None if no frame has been sent through
+            shared memory
+        """
+        if self._frameMemory is None:
+            return None
+        header = np.ndarray((7,), dtype=np.uint64,
+            buffer=self._frameMemory.buf)
+        received, displayed, dropped, latency, totalLatency = \
+            header[2:].tolist()
+        return {"received": received, "displayed": displayed,
+            "dropped": dropped, "latency": latency / 1e9,
+            "meanLatency": totalLatency / displayed / 1e9 if displayed
+            else 0.0}
+
     def show(self):
         """Show a picture using stand-alone Python script
         """
         if self.process is None or self.process.poll() is not None:
             # a show process for this pic is not running, start a new one
             self.process = self.__runScript('show.py')
-        self.__sendPickledPicture()
+            self._frameShape = None
+            self.__releaseOldFrames()
+        self.__sendFrame()
 
     def repaint(self):
         """Reshow a picture using stand-alone Python script
@@ -869,7 +2203,7 @@ class Picture:
         if (self.process is not None) and self.process.poll() is None:
             # subprocess seems to be running, ask it to update image
             try:
-                self.__sendPickledPicture()
+                self.__sendFrame()
             except: # BrokenPipeError:
                 # something went wrong, reset and call show
                 self.process = None
@@ -884,3 +2218,496 @@ class Picture:
         """
         filename = self.__saveInTempFile()
         self.__runScript('pictureTool.py', filename, self.title)
+
+class PictureView(Picture):
+    """Picture showing a rectangular region of another picture
+
+    Created by Picture.view().  Pixel reads and writes go straight to the
+    pixel array of the parent picture.  Drawing is done on a copy of the
+    region, which is written back to the parent the next time the parent
+    or any of its views reads its pixels or image.
+    """
+
+    _parentArray = None
+
+    def __init__(self, parent, upperLeftX, upperLeftY, width, height):
+        """Initializer for PictureView class
+
+        Parameters
+        ----------
+        parent : Picture
+            the picture to show a region of
+        upperLeftX, upperLeftY : int
+            the upper-left corner of the region in parent
+        width, height : int
+            the size of the region
+        """
+        if isinstance(parent, PictureView):
+            # a view of a view is a view of the same parent
+            upperLeftX += parent._box[0]
+            upperLeftY += parent._box[1]
+            parent = parent._parent
+        if not parent._views:
+            parent._views = weakref.WeakSet()
+        parent._views.add(self)
+        self._parent = parent
+        self._box = (upperLeftX, upperLeftY, width, height)
+        self.filename = parent.filename
+        self.title = parent.title
+
+    @property
+    def image(self):
+        """A PIL Image holding a copy of this view's pixels
+
+        Changes to the image are copied into the parent picture when its
+        pixels or image are next used.
+        """
+        if not self._arrayStale:
+            self._image = self._syncImage()
+            self._arrayStale = True
+            self._imageShared = False
+            self._startDrawing()
+        elif self._imageShared:
+            self._image = self._image.copy()
+            self._imageShared = False
+        return self._image
+
+    @image.setter
+    def image(self, image):
+        if image.size != self._box[2:]:
+            print("setImage(image): image is not the size of the view")
+            raise ValueError
+        self._image = image
+        self._imageShared = False
+        self._arrayStale = True
+        self._startDrawing()
+
+    def _drawingImage(self, box=None):
+        """Return the PIL Image for changing part of this view
+
+        The parent records the view's region as changed when the drawing
+        is copied into it.
+        """
+        return self.image
+
+    def _startDrawing(self):
+        """Make pixel access on the parent and its views pick up drawing"""
+        parent = self._parent
+        parent._access = parent._writeAccess = None
+        parent._dropViewHandles()
+
+    def _syncImage(self):
+        """Return a PIL Image with the current pixels of this view
+
+        Returns
+        -------
+        PIL.Image.Image
+            the pending drawing, or a copy of the region of the parent
+        """
+        if self._arrayStale:
+            return self._image
+        x, y, width, height = self._box
+        return self._parent._syncImage().crop((x, y, x + width, y + height))
+
+    def _readArray(self):
+        """Return the region of the parent's pixel array
+
+        Returns
+        -------
+        numpy.ndarray
+            uint8 array of shape (height, width, channels) sharing memory
+            with the parent's pixel array
+        """
+        if self._tracing:
+            raise TraceError("pixel data cannot be read while tracing")
+        parentArray = self._parent._readArray()
+        if parentArray is not self._parentArray:
+            # the parent has a new pixel array
+            x, y, width, height = self._box
+            array = parentArray[y:y+height, x:x+width]
+            if array.shape[:2] != (height, width):
+                print("PictureView: the view is no longer within its picture")
+                raise ValueError
+            self._array = array
+            self._parentArray = parentArray
+        return self._array
+
+    def _writeArray(self):
+        """Return the region of the parent's pixel array for writing
+
+        Returns
+        -------
+        numpy.ndarray
+            uint8 array of shape (height, width, channels)
+        """
+        array = self._readArray()
+        parent = self._parent
+        parent._imageStale = True
+        parent._pyramid = parent._sceneDrawn = None
+        x, y, width, height = self._box
+        parent._markDirty((x, y, x + width, y + height))
+        return array
+
+    def _pixelWriteAccess(self, x=0, y=0):
+        """Return handle for writing pixel levels of the parent's region
+
+        Parameters
+        ----------
+        x : int
+            the x-coord in the view of the pixel that will be written
+        y : int
+            the y-coord in the view of the pixel that will be written
+
+        Returns
+        -------
+        memoryview
+            view of the region of the parent's pixel array
+        """
+        access = self._pixelAccess()
+        parent = self._parent
+        parent._imageStale = True
+        parent._pyramid = parent._sceneDrawn = None
+        if parent._dirtyRects is None:
+            self._writeAccess = access
+        else:
+            parent._dirtyCells.add(((y + self._box[1]) >> _cellShift,
+                (x + self._box[0]) >> _cellShift))
+        return access
+
+    def getArray(self):
+        """Return the region of the parent's pixel array
+
+        Returns
+        -------
+        numpy.ndarray
+            uint8 array of shape (height, width, channels) sharing memory
+            with the parent's pixel array
+        """
+        array = self._writeArray()
+        self._parent._arrayExported = True
+        return array
+
+    def _pyramidLevels(self):
+        """Return no levels; views are always scaled from their pixels"""
+        return []
+
+    def setArray(self, array):
+        """Copy a NumPy array into the pixels of this view
+
+        Parameters
+        ----------
+        array : numpy.ndarray
+            uint8 array of the same shape as getArray()
+        """
+        region = self._writeArray()
+        if not isinstance(array, np.ndarray) or array.shape != region.shape:
+            print("setArray(array): Input is not an array of the view's shape")
+            raise ValueError
+        region[...] = array
+
+    def isLoaded(self):
+        """Return True; a view reads the parent's pixels as needed"""
+        return True
+
+    def getWidth(self):
+        """Return the width of this view
+
+        Returns
+        -------
+        int
+            the width of the region
+        """
+        return self._box[2]
+
+    def getHeight(self):
+        """Return the height of this view
+
+        Returns
+        -------
+        int
+            the height of the region
+        """
+        return self._box[3]
+
+    def detach(self):
+        """Return a copy of the region shown by this view
+
+        Returns
+        -------
+        Picture
+            a picture with its own copy of the region's pixels
+        """
+        image = self._syncImage()
+        if self._arrayStale:
+            image = image.copy()
+        pic = Picture(image)
+        pic.filename = self.filename
+        pic.title = self.title
+        return pic
+
+#----------------------------------------------------------------------------
+# Helpers for the display list of Picture.beginScene
+#----------------------------------------------------------------------------
+
+def _shapeBounds(shape):
+    """Return the box of pixels a recorded shape may change
+
+    Parameters
+    ----------
+    shape : tuple
+        kind, color, coordinates and extra data of the shape
+
+    Returns
+    -------
+    tuple of int
+        left, top, right and bottom (exclusive) of the box
+    """
+    kind, rgb, coords, extra = shape
+    if kind == "text":
+        mask, (left, top) = TextStyle.renderText(*extra)
+        x, y = coords[0] + left, coords[1] + top
+        if mask is None:
+            return (math.floor(x), math.floor(y), math.floor(x),
+                math.floor(y))
+        coords = (x, y, x + mask.width - 1, y + mask.height - 1)
+    return _boxBounds(coords)
+
+def _boxBounds(coords):
+    """Return the box of pixels inside a bounding box or line
+
+    Parameters
+    ----------
+    coords : sequence
+        x1, y1, x2, y2; the corners may be in any order
+
+    Returns
+    -------
+    tuple of int
+        left, top, right and bottom (exclusive) of the box
+    """
+    x0, y0, x1, y1 = coords
+    if x0 > x1:
+        x0, x1 = x1, x0
+    if y0 > y1:
+        y0, y1 = y1, y0
+    if type(x0) is int and type(y0) is int and type(x1) is int \
+            and type(y1) is int:
+        return (x0, y0, x1 + 1, y1 + 1)
+    return (math.floor(x0), math.floor(y0), math.floor(x1) + 1,
+        math.floor(y1) + 1)
+
+def _clipBounds(bounds, width, height):
+    """Return bounds clipped to a width x height picture"""
+    return (max(bounds[0], 0), max(bounds[1], 0), min(bounds[2], width),
+        min(bounds[3], height))
+
+def _drawShapes(draw, entries, box=None):
+    """Draw recorded shapes
+
+    Consecutive copies of the same shape (other than antialiased text)
+    are drawn once, and consecutive lines of one color that join end to
+    end are drawn as one polyline.
+
+    Parameters
+    ----------
+    draw : PIL.ImageDraw.ImageDraw
+        the draw handle
+    entries : list of tuple
+        the shapes and their bounds, in drawing order
+    box : tuple of int
+        if given, only shapes overlapping this box are drawn, shifted so
+        that the box's upper-left corner is at (0, 0)
+    """
+    dx, dy = (box[0], box[1]) if box is not None else (0, 0)
+    polyline, polylineColor = None, None
+    previous = None
+    for entry in entries:
+        shape, bounds = entry
+        if (entry == previous and shape[0] != "text") or (box is not None and (bounds[0] >= box[2]
+                or bounds[1] >= box[3] or bounds[2] <= box[0]
+                or bounds[3] <= box[1])):
+            continue
+        previous = entry
+        kind, rgb, coords, extra = shape
+        coords = [c - (dy if i % 2 else dx) for i, c in enumerate(coords)]
+        if kind == "line" and polyline is not None and rgb == polylineColor \
+                and coords[:2] == polyline[-2:]:
+            polyline += coords[2:]
+            continue
+        if polyline is not None:
+            draw.line(polyline, fill=polylineColor)
+            polyline = None
+        if kind == "line":
+            polyline, polylineColor = coords, rgb
+        elif kind == "rect":
+            draw.rectangle(coords, fill=None, outline=rgb)
+        elif kind == "rectFilled":
+            draw.rectangle(coords, fill=rgb, outline=rgb)
+        elif kind == "oval":
+            draw.ellipse(coords, fill=None, outline=rgb, width=1)
+        elif kind == "ovalFilled":
+            draw.ellipse(coords, fill=rgb, outline=rgb, width=1)
+        elif kind == "arc":
+            draw.arc(coords, extra[0], extra[1], fill=rgb, width=1)
+        elif kind == "arcFilled":
+            draw.pieslice(coords, extra[0], extra[1], fill=rgb, outline=rgb,
+                width=1)
+        elif kind == "text":
+            draw.text(coords, extra[0], rgb, font=extra[1])
+    if polyline is not None:
+        draw.line(polyline, fill=polylineColor)
+
+#----------------------------------------------------------------------------
+# Helpers for Picture.show
+#----------------------------------------------------------------------------
+
+# pixel writes are recorded for repaint() by 2**_cellShift square cells
+_cellShift = 6
+
+def _cellRects(cells, width, height):
+    """Return rectangles covering cells of a width x height picture
+
+    Cells are the 64 x 64 squares pixel writes are recorded in, given as
+    (row, column); cells next to each other in a row are joined.
+    """
+    size = 1 << _cellShift
+    rects = []
+    for row, column in sorted(cells):
+        left, top = column * size, row * size
+        if rects and rects[-1][1] == top and rects[-1][2] == left:
+            rects[-1] = rects[-1][:2] + (min(left + size, width), rects[-1][3])
+        else:
+            rects.append((left, top, min(left + size, width),
+                min(top + size, height)))
+    return rects
+
+def _releaseFrameMemory(segments):
+    """Close and unlink shared memory used to send frames to "show"
+
+    Parameters
+    ----------
+    segments : list of multiprocessing.shared_memory.SharedMemory
+        the segments; emptied
+    """
+    while segments:
+        shm = segments.pop()
+        try:
+            shm.close()
+        except BufferError:
+            # an array still uses the mapping; it goes away with the array
+            pass
+        try:
+            shm.unlink()
+        except OSError:
+            pass
+
+#----------------------------------------------------------------------------
+# Helpers for Picture.scale
+#----------------------------------------------------------------------------
+
+_resampleFilters = {
+    "nearest": PIL.Image.NEAREST,
+    "box": PIL.Image.BOX,
+    "bilinear": PIL.Image.BILINEAR,
+    "bicubic": PIL.Image.BICUBIC,
+    "lanczos": PIL.Image.LANCZOS,
+}
+
+def _reduceFactor(factor):
+    """Return n if factor is 1/n for an integer n >= 1, else None
+
+    Parameters
+    ----------
+    factor : float
+        a scale factor
+
+    Returns
+    -------
+    int
+        the integer reduction factor, or None
+    """
+    if factor <= 0 or factor > 1:
+        return None
+    n = round(1 / factor)
+    return n if abs(n * factor - 1) < 1e-9 else None
+
+#----------------------------------------------------------------------------
+# Helpers for Picture.parallelMap; module level so worker processes can use
+# them
+#----------------------------------------------------------------------------
+
+class _BandPixel(Pixel):
+    """Pixel of a band of rows that reports its row in the whole picture"""
+
+    __slots__ = ("top",)
+
+    def getY(self):
+        """Gets row containing pixel in the whole picture
+
+        Returns
+        -------
+        int
+           row containing the pixel
+        """
+        return self.y + self.top
+
+def _mapRows(array, top, bottom, func, channels):
+    """Call func on the pixels in rows top..bottom-1 of a pixel array
+
+    Parameters
+    ----------
+    array : numpy.ndarray
+        the pixel array of the whole picture; changed in place
+    top, bottom : int
+        the first row and one past the last row to process
+    func : function
+        pixel function, or channel function if channels is True
+    channels : bool
+        True if func is a channel function
+    """
+    band = array[top:bottom]
+    if channels:
+        # call func once per distinct color
+        colors, inverse = np.unique(band[:, :, :3].reshape(-1, 3), axis=0,
+            return_inverse=True)
+        results = np.empty_like(colors)
+        for i, (r, g, b) in enumerate(colors.tolist()):
+            result = func(r, g, b)
+            if isinstance(result, Color):
+                result = result.getRGB()
+            results[i] = [Pixel.correctLevel(level) for level in result[:3]]
+        band[:, :, :3] = results[inverse.reshape(-1)].reshape(band.shape[:2] + (3,))
+    else:
+        pic = Picture(1, 1)
+        pic.setArray(band)
+        for y in range(band.shape[0]):
+            for x in range(band.shape[1]):
+                pixel = _BandPixel(pic, x, y)
+                pixel.top = top
+                func(pixel)
+
+def _mapSharedRows(name, shape, top, bottom, func, channels, wrapLevels):
+    """Worker process entry point for Picture.parallelMap
+
+    Parameters
+    ----------
+    name : str
+        name of the shared memory block holding the pixel array
+    shape : tuple of int
+        shape of the pixel array
+    top, bottom : int
+        the first row and one past the last row to process
+    func : function
+        pixel function, or channel function if channels is True
+    channels : bool
+        True if func is a channel function
+    wrapLevels : boolean
+        Pixel's wrapLevels setting in the parent process
+    """
+    Pixel.setWrapLevels(wrapLevels)
+    shm = shared_memory.SharedMemory(name=name)
+    try:
+        _mapRows(np.ndarray(shape, dtype=np.uint8, buffer=shm.buf), top,
+            bottom, func, channels)
+    finally:
+        shm.close()
@@ -0,0 +1,295 @@
+"""Module for drawing many shapes on a picture in one batch
+
+Each drawing method of Picture (addLine, addRect, ...) gets the picture's
+image and sets up a new PIL.ImageDraw.Draw for every call.  A
+PictureDrawing keeps one draw handle for a whole batch of shapes and also
+accepts whole arrays of shapes:
+
+    with pic.drawing() as d:
+        d.addLines(blue, segments)      # rows of x1, y1, x2, y2
+        d.addRectsFilled(red, boxes)    # rows of x, y, w, h
+        d.addPoints(black, points)      # rows of x, y
+
+Shape arrays may be NumPy arrays or sequences of tuples.
+"""
+
+import numpy as np
+import PIL.ImageDraw
+from jes4py.PixelColor import Color
+
+class PictureDrawing:
+    """Batch of drawing operations on one picture
+
+    Created by Picture.drawing().  The picture may be used normally in the
+    middle of a batch; the draw handle is set up again when the picture's
+    pixels have been changed or read in the meantime.
+
+    Attributes
+    ----------
+    picture : Picture
+        the picture being drawn on
+    """
+
+    def __init__(self, picture):
+        """Initialize drawing batch
+
+        Parameters
+        ----------
+        picture : Picture
+            the picture to draw on
+        """
+        self.picture = picture
+        self._image = None
+        self._draw = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self._image = self._draw = None
+        return False
+
+    def _handle(self):
+        """Return the draw handle, setting it up again if needed
+
+        Drawing goes directly into the picture's image, so the handle is
+        only reused while the picture still uses that image and its pixel
+        array and pyramid are already marked as out of date.
+
+        Returns
+        -------
+        PIL.ImageDraw.ImageDraw
+            the draw handle
+        """
+        pic = self.picture
+        if self._draw is None or pic._image is not self._image \
+                or pic._imageStale or pic._imageShared \
+                or pic._pyramid is not None \
+                or (pic._array is not None and not pic._arrayStale):
+            self._image = pic.image
+            self._draw = PIL.ImageDraw.Draw(self._image)
+        return self._draw
+
+    @staticmethod
+    def _rgb(acolor, name):
+        """Return the RGB tuple of acolor, which must be a Color
+
+        Parameters
+        ----------
+        acolor : Color
+            the color to check
+        name : str
+            the calling method, for the error message
+
+        Returns
+        -------
+        tuple of int
+            the red, green and blue levels
+        """
+        if not isinstance(acolor, Color):
+            print(name + "(color, ...): First input is not a color")
+            raise ValueError
+        return acolor.getRGB()
+
+    @staticmethod
+    def _rows(values, width, name):
+        """Return shape data as an integer array with width columns
+
+        Parameters
+        ----------
+        values : array_like
+            the shapes, one per row
+        width : int
+            the number of values per shape
+        name : str
+            the calling method, for the error message
+
+        Returns
+        -------
+        numpy.ndarray
+            array of shape (n, width)
+        """
+        array = np.asarray(values)
+        if array.size == 0:
+            return np.empty((0, width), dtype=int)
+        if array.ndim != 2 or array.shape[1] != width:
+            print("{}(color, shapes): shapes are not rows of {} values".format(
+                name, width))
+            raise ValueError
+        return array
+
+    @staticmethod
+    def _boxes(rects):
+        """Return rows of x, y, w, h as lists of x1, y1, x2, y2
+
+        Parameters
+        ----------
+        rects : numpy.ndarray
+            array of shape (n, 4)
+
+        Returns
+        -------
+        list of list
+            the bounding boxes
+        """
+        boxes = rects.copy()
+        boxes[:, 2:] += rects[:, :2]
+        return boxes.tolist()
+
+    # Single shapes; same arguments as the Picture methods
+
+    def addLine(self, acolor, x1, y1, x2, y2):
+        """Draw a line (see Picture.addLine)"""
+        self._handle().line([x1, y1, x2, y2], fill=acolor.getRGB())
+
+    def addText(self, acolor, x, y, string):
+        """Draw a line of text (see Picture.addText)"""
+        self._handle().text((x, y), string, acolor.getRGB())
+
+    def addRect(self, acolor, x, y, w, h):
+        """Draw the outline of a rectangle (see Picture.addRect)"""
+        self._handle().rectangle([x, y, x+w, y+h], fill=None,
+            outline=acolor.getRGB())
+
+    def addRectFilled(self, acolor, x, y, w, h):
+        """Draw a filled rectangle (see Picture.addRectFilled)"""
+        color = acolor.getRGB()
+        self._handle().rectangle([x, y, x+w, y+h], fill=color, outline=color)
+
+    def addOval(self, acolor, x, y, w, h):
+        """Draw the outline of an oval (see Picture.addOval)"""
+        self._handle().ellipse([x, y, x+w, y+h], fill=None,
+            outline=acolor.getRGB(), width=1)
+
+    def addOvalFilled(self, acolor, x, y, w, h):
+        """Draw a filled oval (see Picture.addOvalFilled)"""
+        color = acolor.getRGB()
+        self._handle().ellipse([x, y, x+w, y+h], fill=color, outline=color,
+            width=1)
+
+    def addArc(self, acolor, x, y, w, h, start, angle):
+        """Draw the outline of an arc (see Picture.addArc)"""
+        end = -start % 360
+        start = -(start+angle) % 360
+        if start > end:
+            start, end = end, start
+        self._handle().arc([x, y, x+w, y+h], start, end,
+            fill=acolor.getRGB(), width=1)
+
+    def addArcFilled(self, acolor, x, y, w, h, start, angle):
+        """Draw a filled arc (see Picture.addArcFilled)"""
+        end = -start % 360
+        start = -(start+angle) % 360
+        if start > end:
+            start, end = end, start
+        color = acolor.getRGB()
+        self._handle().pieslice([x, y, x+w, y+h], start, end, fill=color,
+            outline=color, width=1)
+
+    # Arrays of shapes
+
+    def addLines(self, acolor, segments):
+        """Draw line segments
+
+        Parameters
+        ----------
+        acolor : Color
+            the color of the lines
+        segments : array_like
+            rows of x1, y1, x2, y2
+        """
+        color = self._rgb(acolor, "addLines")
+        segments = self._rows(segments, 4, "addLines").tolist()
+        line = self._handle().line
+        for segment in segments:
+            line(segment, fill=color)
+
+    def addPolyline(self, acolor, points):
+        """Draw connected line segments through a list of points
+
+        Parameters
+        ----------
+        acolor : Color
+            the color of the lines
+        points : array_like
+            rows of x, y
+        """
+        color = self._rgb(acolor, "addPolyline")
+        points = self._rows(points, 2, "addPolyline")
+        if len(points) > 1:
+            self._handle().line(points.ravel().tolist(), fill=color)
+
+    def addPoints(self, acolor, points):
+        """Set the color of single pixels
+
+        Parameters
+        ----------
+        acolor : Color
+            the color of the points
+        points : array_like
+            rows of x, y
+        """
+        color = self._rgb(acolor, "addPoints")
+        points = self._rows(points, 2, "addPoints")
+        if len(points) > 0:
+            self._handle().point(points.ravel().tolist(), fill=color)
+
+    def addRects(self, acolor, rects):
+        """Draw the outlines of rectangles
+
+        Parameters
+        ----------
+        acolor : Color
+            the color of the rectangle borders
+        rects : array_like
+            rows of x, y, w, h
+        """
+        color = self._rgb(acolor, "addRects")
+        rectangle = self._handle().rectangle
+        for box in self._boxes(self._rows(rects, 4, "addRects")):
+            rectangle(box, fill=None, outline=color)
+
+    def addRectsFilled(self, acolor, rects):
+        """Draw filled rectangles
+
+        Parameters
+        ----------
+        acolor : Color
+            the color the rectangles are filled with
+        rects : array_like
+            rows of x, y, w, h
+        """
+        color = self._rgb(acolor, "addRectsFilled")
+        rectangle = self._handle().rectangle
+        for box in self._boxes(self._rows(rects, 4, "addRectsFilled")):
+            rectangle(box, fill=color, outline=color)
+
+    def addOvals(self, acolor, rects):
+        """Draw the outlines of ovals
+
+        Parameters
+        ----------
+        acolor : Color
+            the color of the oval borders
+        rects : array_like
+            rows of x, y, w, h for the ovals' bounding rectangles
+        """
+        color = self._rgb(acolor, "addOvals")
+        ellipse = self._handle().ellipse
+        for box in self._boxes(self._rows(rects, 4, "addOvals")):
+            ellipse(box, fill=None, outline=color, width=1)
+
+    def addOvalsFilled(self, acolor, rects):
+        """Draw filled ovals
+
+        Parameters
+        ----------
+        acolor : Color
+            the color the ovals are filled with
+        rects : array_like
+            rows of x, y, w, h for the ovals' bounding rectangles
+        """
+        color = self._rgb(acolor, "addOvalsFilled")
+        ellipse = self._handle().ellipse
+        for box in self._boxes(self._rows(rects, 4, "addOvalsFilled")):
+            ellipse(box, fill=color, outline=color, width=1)
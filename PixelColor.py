@@ -2,34 +2,40 @@ from jes4py import Config
 import math
 import wx
 import os, sys, subprocess
+from collections import OrderedDict
+from collections.abc import Sequence
 
 class Pixel:
-    """Provides access to pixels within an PIL image
+    """Provides access to pixels within a Picture
 
     Attributes
     ----------
     wrapLevels : boolean
         Indicates whether levels outside the range 0-255 are clamped
         or wrapped around (saturating or modular arithmetic).
-        False to clamp levels, true to modulo them.
+        False to clamp levels, true to modulo them.  Read from the
+        configuration once, when the class is created, and shared by
+        all pixels.
     """
 
-    wrapLevels = False
+    __slots__ = ("picture", "x", "y")
 
-    def __init__(self, image=None, x=None, y=None):
+    wrapLevels = Config.getConfigVal("CONFIG_WRAPPIXELVALUES")
+
+    def __init__(self, picture=None, x=None, y=None):
         """Pixel constructor
 
         Parameters
         ----------
-        image : PIL.Image
-            image the pixel belongs to
+        picture : Picture
+            picture the pixel belongs to; the pixel reads and writes
+            through the picture's pixel array
         x : int
             column of the pixel
         y : int
             row of the pixel
         """
-        self.wrapLevels = Config.getConfigVal("CONFIG_WRAPPIXELVALUES")
-        self.image = image
+        self.picture = picture
         self.x = x
         self.y = y
         #self.color = color
@@ -42,8 +48,9 @@ class Pixel:
         str
             user-readable pixel information
         """
-        rgb = self.image.getpixel((self.x, self.y))
-        return "Pixel red={} green={} blue={}".format(rgb[0], rgb[1], rgb[2])
+        a = self.picture._access or self.picture._pixelAccess()
+        return "Pixel red={} green={} blue={}".format(a[self.y, self.x, 0],
+            a[self.y, self.x, 1], a[self.y, self.x, 2])
 
     def __repr__(self):
         """Return string representation of pixel
@@ -93,8 +100,8 @@ class Pixel:
         int
             red level in pixel
         """
-        rgb = self.image.getpixel((self.x, self.y))
-        return rgb[0]
+        a = self.picture._access or self.picture._pixelAccess()
+        return a[self.y, self.x, 0]
 
     def getGreen(self):
         """Return green level in pixel
@@ -104,8 +111,8 @@ class Pixel:
         int
             green level in pixel
         """
-        rgb = self.image.getpixel((self.x, self.y))
-        return rgb[1]
+        a = self.picture._access or self.picture._pixelAccess()
+        return a[self.y, self.x, 1]
 
     def getBlue(self):
         """Return blue level in pixel
@@ -115,8 +122,8 @@ class Pixel:
         int
             blue level in pixel
         """
-        rgb = self.image.getpixel((self.x, self.y))
-        return rgb[2]
+        a = self.picture._access or self.picture._pixelAccess()
+        return a[self.y, self.x, 2]
 
     def getAverage(self):
         """Return the average of the color values of this pixel
@@ -126,8 +133,9 @@ class Pixel:
         int
             rounded average of red, green, and blue pixel values
         """
-        rgb = self.image.getpixel((self.x, self.y))
-        return round((rgb[0] + rgb[1] + rgb[2]) / 3.0)
+        a = self.picture._access or self.picture._pixelAccess()
+        total = a[self.y, self.x, 0] + a[self.y, self.x, 1] + a[self.y, self.x, 2]
+        return round(total / 3.0)
     
     def setAlpha(self, value):
         """Set alpha level in the pixel (NOT IMPLEMENTED)
@@ -148,10 +156,8 @@ class Pixel:
         value : int
             red level for pixel
         """
-        value = Pixel.correctLevel(value)
-        color = Color(self.image.getpixel((self.x, self.y)))
-        newColor = (value, color.getGreen(), color.getBlue())
-        self.image.putpixel((self.x, self.y), newColor)
+        a = self.picture._writeAccess or self.picture._pixelWriteAccess(self.x, self.y)
+        a[self.y, self.x, 0] = Pixel.correctLevel(value)
 
     def setGreen(self, value):
         """Set green level in the pixel
@@ -161,10 +167,8 @@ class Pixel:
         value : int
             green level for pixel
         """
-        value = Pixel.correctLevel(value)
-        color = Color(self.image.getpixel((self.x, self.y)))
-        newColor = (color.getRed(), value, color.getBlue())
-        self.image.putpixel((self.x, self.y), newColor)
+        a = self.picture._writeAccess or self.picture._pixelWriteAccess(self.x, self.y)
+        a[self.y, self.x, 1] = Pixel.correctLevel(value)
 
     def setBlue(self, value):
         """Set blue level in the pixel
@@ -174,10 +178,8 @@ class Pixel:
         value : int
             blue level for pixel
         """
-        value = Pixel.correctLevel(value)
-        color = Color(self.image.getpixel((self.x, self.y)))
-        newColor = (color.getRed(), color.getGreen(), value)
-        self.image.putpixel((self.x, self.y), newColor)
+        a = self.picture._writeAccess or self.picture._pixelWriteAccess(self.x, self.y)
+        a[self.y, self.x, 2] = Pixel.correctLevel(value)
 
     def colorDistance(self, testColor):
         """Computes the Euclidean distance norm between this pixel and a color
@@ -200,12 +202,18 @@ class Pixel:
     def getColor(self):
         """Returns the color object for the pixel
 
+        The color may be shared with other callers that got the same
+        levels, so it cannot be changed with setRGB; make a new color
+        with Color(color) to change.
+
         Returns
         -------
         Color
             color object for the pixel
         """
-        return Color(self.image.getpixel((self.x, self.y)))
+        a = self.picture._access or self.picture._pixelAccess()
+        return Color._fromRGB((a[self.y, self.x, 0], a[self.y, self.x, 1],
+            a[self.y, self.x, 2]))
 
     def setColor(self, color):
         """Set the color of a pixel
@@ -215,7 +223,11 @@ class Pixel:
         color : Color
             color to assign to pixel
         """
-        self.image.putpixel((self.x, self.y), color.getRGB())
+        a = self.picture._writeAccess or self.picture._pixelWriteAccess(self.x, self.y)
+        r, g, b = color.getRGB()[:3]
+        a[self.y, self.x, 0] = r
+        a[self.y, self.x, 1] = g
+        a[self.y, self.x, 2] = b
 
     def setColorFrom(self, otherPixel):
         """Set color of this pixel using color value from otherPixel
@@ -262,7 +274,13 @@ class Pixel:
         int
             corrected color level
         """
-        level = int(level)
+        try:
+            level = int(level)
+        except TypeError:
+            # symbolic levels traced by PixelTrace correct themselves
+            if not hasattr(level, "correctLevel"):
+                raise
+            return level.correctLevel(cls.wrapLevels)
         if cls.wrapLevels:
             return level % 256
         elif level < 0:
@@ -294,6 +312,105 @@ class Pixel:
         return cls.wrapLevels
 
 
+class PixelCursor(Pixel):
+    """Pixel that is moved around a picture instead of being recreated
+
+    Used by Picture.iterPixels() so that a loop over all pixels works
+    with a single object.  A cursor has the full Pixel interface, but it
+    always refers to the position it was last moved to, so it should not
+    be stored for later use.
+    """
+
+    __slots__ = ()
+
+
+class PixelSequence(Sequence):
+    """Read-only sequence of the pixels in a picture
+
+    Pixel objects are created only when they are indexed or iterated over,
+    so the sequence takes the same small amount of memory for any picture
+    size.  Pixels are ordered row-by-row.  Slicing returns another
+    PixelSequence.
+    """
+
+    def __init__(self, picture, indices=None):
+        """PixelSequence constructor
+
+        Parameters
+        ----------
+        picture : Picture
+            picture the pixels belong to
+        indices : range or list of int
+            flattened (row-by-row) positions of the pixels in the sequence;
+            all pixels of the picture if not provided
+        """
+        self.picture = picture
+        self.width = picture.getWidth()
+        if indices is None:
+            indices = range(self.width * picture.getHeight())
+        self.indices = indices
+
+    def __len__(self):
+        """Return number of pixels in the sequence
+
+        Returns
+        -------
+        int
+            number of pixels
+        """
+        return len(self.indices)
+
+    def __getitem__(self, index):
+        """Return pixel at position index, or a PixelSequence for a slice
+
+        Parameters
+        ----------
+        index : int or slice
+            position of the pixel or slice of positions
+
+        Returns
+        -------
+        Pixel or PixelSequence
+            the pixel at index, or the pixels selected by the slice
+        """
+        if isinstance(index, slice):
+            return PixelSequence(self.picture, self.indices[index])
+        y, x = divmod(self.indices[index], self.width)
+        return Pixel(self.picture, x, y)
+
+    def __iter__(self):
+        """Return iterator that creates the pixels one at a time
+
+        Returns
+        -------
+        iterator of Pixel
+            the pixels in the sequence
+        """
+        picture = self.picture
+        width = self.width
+        for i in self.indices:
+            y, x = divmod(i, width)
+            yield Pixel(picture, x, y)
+
+    def __str__(self):
+        """Return string with sequence information
+
+        Returns
+        -------
+        str
+            user-readable sequence information
+        """
+        return "PixelSequence of {} pixels".format(len(self.indices))
+
+    def __repr__(self):
+        """Return string representation of sequence
+
+        Returns
+        -------
+        str
+            string of sequence information
+        """
+        return self.__str__()
 
 
 class Color:
@@ -302,8 +419,24 @@ class Color:
     Has getters and setters for the red, green, and blue portions of
     the over all color as well as giving the user capabilities to
     compare color values.
+
+    Colors are values that should not be changed once made, so they can
+    be used as dictionary keys and set members.  Colors read from pixels
+    or computed from other colors come from a cache of recently used
+    colors, so equal colors are often the same object; these shared
+    colors cannot be changed with setRGB.
+
+    Attributes
+    ----------
+    cacheSize : int
+        maximum number of colors kept in the cache
     """
 
+    __slots__ = ("color", "_shared")
+
+    cacheSize = 4096
+    _cache = OrderedDict()
+
     def __init__(self, r, g=None, b=None):
         """Initialize a color object
 
@@ -319,7 +452,7 @@ class Color:
             blue level (if not provided then r is used)
         """
 
-        if b == None or g == None:
+        if b is None or g is None:
             if isinstance(r, tuple):
                 self.color = r
             elif isinstance(r, list):
@@ -330,10 +463,45 @@ class Color:
                 val = Pixel.correctLevel(r)
                 self.color = (val, val, val)
         else:
-            r = Pixel.correctLevel(r)
-            g = Pixel.correctLevel(g)
-            b = Pixel.correctLevel(b)
-            self.color = (r, g, b)
+            correctLevel = Pixel.correctLevel
+            self.color = (correctLevel(r), correctLevel(g), correctLevel(b))
+
+    @classmethod
+    def _fromRGB(cls, rgb):
+        """Return a color for an RGB tuple whose levels are already in [0..255]
+
+        Skips the argument handling of the constructor, for tuples read
+        from a picture or levels that have already been corrected.  The
+        color is taken from the cache of recently used colors if possible.
+
+        Parameters
+        ----------
+        rgb : tuple of int
+            the red, green, and blue levels
+
+        Returns
+        -------
+        Color
+            the color with the given levels
+        """
+        cache = Color._cache
+        try:
+            color = cache.get(rgb)
+        except TypeError:
+            # symbolic levels traced by PixelTrace are not cached
+            color = object.__new__(cls)
+            color.color = rgb
+            return color
+        if color is None:
+            color = object.__new__(cls)
+            color.color = rgb
+            color._shared = True
+            cache[rgb] = color
+            if len(cache) > Color.cacheSize:
+                cache.popitem(last=False)
+        else:
+            cache.move_to_end(rgb)
+        return color
 
     def __str__(self):
         """String for Color
@@ -368,6 +536,8 @@ class Color:
         boolean
             True if colors are the same, False otherwise
         """
+        if not isinstance(otherColor, Color):
+            return NotImplemented
         return (self.color == otherColor.color)
 
     def __ne__(self, otherColor):
@@ -383,7 +553,20 @@ class Color:
         boolean
             True if colors are not the same, False otherwise
         """
-        return (not self.__eq__(otherColor))
+        equal = self.__eq__(otherColor)
+        if equal is NotImplemented:
+            return equal
+        return (not equal)
+
+    def __hash__(self):
+        """Hash value for color, so colors can be dict keys and set members
+
+        Returns
+        -------
+        int
+            hash of the RGB values
+        """
+        return hash(self.color)
 
     def __add__(self, otherColor):
         """Sum of this color and otherColor
@@ -402,7 +585,7 @@ class Color:
             r = Pixel.correctLevel(self.color[0] + otherColor.color[0])
             g = Pixel.correctLevel(self.color[1] + otherColor.color[1])
             b = Pixel.correctLevel(self.color[2] + otherColor.color[2])
-        return Color(r, g, b)
+        return Color._fromRGB((r, g, b))
 
     def __sub__(self, otherColor):
         """Difference of this color and otherColor
@@ -420,16 +603,24 @@ class Color:
         r = Pixel.correctLevel(self.color[0] - otherColor.color[0])
         g = Pixel.correctLevel(self.color[1] - otherColor.color[1])
         b = Pixel.correctLevel(self.color[2] - otherColor.color[2])
-        return Color(r, g, b)
+        return Color._fromRGB((r, g, b))
 
     def setRGB(self, r, g, b):
         """Sets this color's red, green, blue color values
+
+        Colors are meant to be left unchanged once made; prefer making a
+        new Color.  Changing a color that is a dict key or set member
+        leaves it filed under its old value.  Colors from the cache of
+        recently used colors are shared and cannot be changed.
     
         Parameters
         ----------
         r, g, b : int or float
             the red, green, and blue values
         """
+        if getattr(self, "_shared", False):
+            print("setRGB(r,g,b): This color is shared and cannot be changed, make a new color with Color(color)")
+            raise ValueError
         r = Pixel.correctLevel(r)
         g = Pixel.correctLevel(g)
         b = Pixel.correctLevel(b)
@@ -513,7 +704,7 @@ class Color:
         r = Pixel.correctLevel(self.color[0] * scaleFactor)
         g = Pixel.correctLevel(self.color[1] * scaleFactor)
         b = Pixel.correctLevel(self.color[2] * scaleFactor)
-        return Color(r, g, b)
+        return Color._fromRGB((r, g, b))
 
     def makeDarker(self):
         """Return a darker version of this color
@@ -0,0 +1,582 @@
+"""Module for running per-pixel functions as whole-array operations
+
+A pixel function such as
+
+    def swap(px):
+        setRed(px, getBlue(px))
+        setBlue(px, getRed(px) * 0.8)
+
+is called once with a TracePixel, a stand-in pixel whose levels are
+symbolic expressions.  The reads, arithmetic and set calls it makes are
+recorded as an expression for each channel, and the expressions are then
+evaluated with NumPy over the whole pixel array of the picture.
+
+Anything that cannot be recorded, such as an if statement or comparison
+that depends on a level, int() or math functions of a level, or access to
+the picture's pixel data, raises TraceError.  Picture.applyPixelFunction
+then runs the function on every pixel instead.
+
+Tracing only gives the right result if the function does the same thing
+for every pixel and has no effect other than setting the pixel's levels.
+Functions that use random numbers or keep state between calls are not
+traced, and neither are functions whose two traces differ.  While a
+function is traced, it may only call jes4py functions and methods, a few
+pure builtins such as abs() and round(), and functions of its own that
+follow the same rules; any other call, such as print() or list.append(),
+stops the trace before it is made.
+Levels are computed with 64-bit integers, so traces whose values could
+overflow them are also run on every pixel.
+"""
+
+import os, sys, dis, random, types
+import numpy as np
+from jes4py.PixelColor import Pixel, Color
+
+class TraceError(TypeError):
+    """Raised when a pixel function cannot be traced"""
+    pass
+
+class Expr:
+    """Symbolic value recorded while tracing a pixel function
+
+    Attributes
+    ----------
+    op : str
+        the operation: "level", "x", "y", "const", an arithmetic operation,
+        or "correct"
+    args : tuple
+        the operands; for "level" the channel number, for "const" the
+        value and for "correct" the operand and the wrap setting
+    """
+
+    __slots__ = ("op", "args")
+
+    def __init__(self, op, *args):
+        """Initialize an expression
+
+        Parameters
+        ----------
+        op : str
+            the operation
+        *args : list
+            the operands
+        """
+        self.op = op
+        self.args = args
+
+    def __repr__(self):
+        """Representation of expression
+
+        Returns
+        -------
+        str
+            string showing the operation and its operands
+        """
+        return "Expr({}, {})".format(self.op, ", ".join(map(repr, self.args)))
+
+    def _binary(self, op, other, reverse=False):
+        """Return expression combining this expression with other
+
+        Parameters
+        ----------
+        op : str
+            the operation
+        other : Expr, int or float
+            the other operand
+        reverse : bool
+            True if other is the left operand
+
+        Returns
+        -------
+        Expr
+            the combined expression, or NotImplemented for other operands
+        """
+        if isinstance(other, (int, float)):
+            other = Expr("const", other)
+        elif not isinstance(other, Expr):
+            return NotImplemented
+        return Expr(op, other, self) if reverse else Expr(op, self, other)
+
+    # Arithmetic records the operation as a new expression
+
+    def __add__(self, other):
+        return self._binary("add", other)
+
+    def __radd__(self, other):
+        return self._binary("add", other, True)
+
+    def __sub__(self, other):
+        return self._binary("sub", other)
+
+    def __rsub__(self, other):
+        return self._binary("sub", other, True)
+
+    def __mul__(self, other):
+        return self._binary("mul", other)
+
+    def __rmul__(self, other):
+        return self._binary("mul", other, True)
+
+    def __truediv__(self, other):
+        return self._binary("truediv", other)
+
+    def __rtruediv__(self, other):
+        return self._binary("truediv", other, True)
+
+    def __floordiv__(self, other):
+        return self._binary("floordiv", other)
+
+    def __rfloordiv__(self, other):
+        return self._binary("floordiv", other, True)
+
+    def __mod__(self, other):
+        return self._binary("mod", other)
+
+    def __rmod__(self, other):
+        return self._binary("mod", other, True)
+
+    def __pow__(self, other):
+        return self._binary("pow", other)
+
+    def __rpow__(self, other):
+        return self._binary("pow", other, True)
+
+    def __neg__(self):
+        return Expr("neg", self)
+
+    def __pos__(self):
+        return self
+
+    def __abs__(self):
+        return Expr("abs", self)
+
+    def __round__(self, ndigits=None):
+        if ndigits is not None:
+            raise TraceError("round() with digits cannot be traced")
+        return Expr("round", self)
+
+    def _untraceable(self, *args):
+        raise TraceError("value depends on the pixel and cannot be traced")
+
+    # Branching, comparisons and conversions need the actual level
+    __bool__ = __int__ = __float__ = __index__ = _untraceable
+    __eq__ = __ne__ = __lt__ = __le__ = __gt__ = __ge__ = _untraceable
+    __hash__ = None
+
+    def correctLevel(self, wrapLevels):
+        """Return expression mapping this one to [0..255]
+
+        Called by Pixel.correctLevel for symbolic levels.
+
+        Parameters
+        ----------
+        wrapLevels : boolean
+            true to wrap levels, false to clamp them
+
+        Returns
+        -------
+        Expr
+            the corrected level
+        """
+        return Expr("correct", self, wrapLevels)
+
+class TracePixel(Pixel):
+    """Stand-in pixel that records what a pixel function does
+
+    Levels read from the pixel are expressions, and the levels set on it
+    are kept as the expressions for the new picture.
+    """
+
+    __slots__ = ("levels",)
+
+    def __init__(self, picture):
+        """Initialize trace pixel
+
+        Parameters
+        ----------
+        picture : Picture
+            the picture the function is traced for
+        """
+        Pixel.__init__(self, picture, Expr("x"), Expr("y"))
+        self.levels = [Expr("level", 0), Expr("level", 1), Expr("level", 2)]
+
+    def getRed(self):
+        """Return expression for the red level"""
+        return self.levels[0]
+
+    def getGreen(self):
+        """Return expression for the green level"""
+        return self.levels[1]
+
+    def getBlue(self):
+        """Return expression for the blue level"""
+        return self.levels[2]
+
+    def getAverage(self):
+        """Return expression for the rounded average level"""
+        return round((self.levels[0] + self.levels[1] + self.levels[2]) / 3.0)
+
+    def setRed(self, value):
+        """Record the corrected value as the red level"""
+        self.levels[0] = Pixel.correctLevel(value)
+
+    def setGreen(self, value):
+        """Record the corrected value as the green level"""
+        self.levels[1] = Pixel.correctLevel(value)
+
+    def setBlue(self, value):
+        """Record the corrected value as the blue level"""
+        self.levels[2] = Pixel.correctLevel(value)
+
+    def getColor(self):
+        """Return color holding the expressions for the levels"""
+        color = object.__new__(Color)
+        color.color = tuple(self.levels)
+        return color
+
+    def setColor(self, color):
+        """Record the levels of color, which must be expressions or levels in [0..255]"""
+        levels = list(color.getRGB()[:3])
+        for level in levels:
+            if not isinstance(level, Expr) and (type(level) is not int
+                    or level < 0 or level > 255):
+                raise TraceError("color level {} cannot be traced".format(level))
+        self.levels = levels
+
+_binaryOps = {
+    "add": np.add,
+    "sub": np.subtract,
+    "mul": np.multiply,
+    "truediv": np.true_divide,
+    "floordiv": np.floor_divide,
+    "mod": np.mod,
+    "pow": np.power,
+}
+
+# Integer values must stay well inside int64; Python ints never overflow
+_intLimit = 2.0 ** 62
+
+def _checkInt(op, left, right):
+    """Raise TraceError if an integer operation may overflow
+
+    Parameters
+    ----------
+    op : str
+        the operation
+    left, right : numpy.ndarray or number
+        the integer operands
+    """
+    approx = _binaryOps[op](np.asarray(left, np.float64),
+        np.asarray(right, np.float64))
+    if not np.all(np.abs(approx) < _intLimit):
+        raise TraceError("level is too large for 64-bit integers")
+
+def _toInt(value):
+    """Return float values converted to int64, as int() would
+
+    Parameters
+    ----------
+    value : numpy.ndarray or number
+        whole-numbered values
+
+    Returns
+    -------
+    numpy.ndarray
+        the values as int64
+    """
+    if not np.all(np.abs(value) < _intLimit):
+        # includes inf and nan, for which int() raises an error
+        raise TraceError("level is too large for 64-bit integers")
+    return np.asarray(value).astype(np.int64)
+
+# Builtins that may be called while tracing; they have no side effects
+_pureBuiltins = (abs, round, min, max, pow, divmod, int, float, isinstance,
+    len)
+
+_packageDir = os.path.dirname(os.path.abspath(__file__))
+
+def _inPackage(code):
+    """Return True if code belongs to a jes4py module
+
+    Parameters
+    ----------
+    code : code
+        the code object
+
+    Returns
+    -------
+    bool
+        True for code in the jes4py directory
+    """
+    return os.path.dirname(os.path.abspath(code.co_filename)) == _packageDir
+
+def _storesState(code):
+    """Return True if code assigns to anything but its own local variables
+
+    Parameters
+    ----------
+    code : code
+        the code object
+
+    Returns
+    -------
+    bool
+        True if code assigns to global or enclosing variables, or to items
+        or attributes of objects
+    """
+    for instruction in dis.get_instructions(code):
+        op = instruction.opname
+        if op in ("STORE_GLOBAL", "DELETE_GLOBAL", "STORE_SUBSCR",
+                "DELETE_SUBSCR", "STORE_ATTR", "DELETE_ATTR") or \
+                (op in ("STORE_DEREF", "DELETE_DEREF") and
+                instruction.argval in code.co_freevars):
+            return True
+    return False
+
+def _impure(func, seen=None):
+    """Return True if func may not do the same thing on every call
+
+    Looks through the code of func, of functions defined in it and of the
+    functions it refers to by global name, other than those of jes4py,
+    for assignments to global or enclosing variables, assignments to
+    items or attributes of objects, and use of random numbers.
+
+    Parameters
+    ----------
+    func : function
+        the function to check
+    seen : set
+        code objects already checked
+
+    Returns
+    -------
+    bool
+        True if func must not be traced
+    """
+    if seen is None:
+        seen = set()
+    code = getattr(func, "__code__", None)
+    if code is None:
+        # builtins and other callables cannot be looked into
+        return not isinstance(func, types.BuiltinFunctionType)
+    codes = [code]
+    while codes:
+        code = codes.pop()
+        if code in seen:
+            continue
+        seen.add(code)
+        if _storesState(code):
+            return True
+        for const in code.co_consts:
+            if isinstance(const, types.CodeType):
+                codes.append(const)
+        for name in code.co_names:
+            if name == "random":
+                return True
+            value = func.__globals__.get(name)
+            if value is None:
+                continue
+            if isinstance(value, types.ModuleType):
+                if value.__name__ in ("random", "secrets", "numpy.random"):
+                    return True
+            elif isinstance(getattr(value, "__self__", None),
+                    random.Random) or getattr(value, "__module__", None) in \
+                    ("random", "secrets", "numpy.random"):
+                return True
+            elif isinstance(value, types.FunctionType) and not \
+                    (value.__module__ or "").startswith("jes4py") and \
+                    _impure(value, seen):
+                return True
+    return False
+
+def _sameExpr(a, b, memo):
+    """Return True if two traced expressions are the same
+
+    Parameters
+    ----------
+    a, b : Expr, int or float
+        the expressions
+    memo : set
+        pairs of expression ids already found to be the same
+
+    Returns
+    -------
+    bool
+        True if a and b compute the same value
+    """
+    if not isinstance(a, Expr) or not isinstance(b, Expr):
+        return type(a) is type(b) and a == b
+    if (id(a), id(b)) in memo:
+        return True
+    if a.op != b.op or len(a.args) != len(b.args) or \
+            not all(_sameExpr(x, y, memo) for x, y in zip(a.args, b.args)):
+        return False
+    memo.add((id(a), id(b)))
+    return True
+
+def tracePixelFunction(func, picture):
+    """Trace a pixel function
+
+    The function is traced twice, and is only used if it does not use
+    random numbers or keep state between calls and both traces agree.
+
+    Parameters
+    ----------
+    func : function
+        function taking a pixel
+    picture : Picture
+        the picture the function will be applied to
+
+    Returns
+    -------
+    list of Expr
+        expressions for the new red, green and blue levels, or None if the
+        function could not be traced
+    """
+    if _impure(func):
+        return None
+    levels = _trace(func, picture)
+    if levels is None:
+        return None
+    again = _trace(func, picture)
+    if again is None or not all(_sameExpr(a, b, set())
+            for a, b in zip(levels, again)):
+        return None
+    return levels
+
+def _trace(func, picture):
+    """Call a pixel function once with a TracePixel
+
+    Parameters
+    ----------
+    func : function
+        function taking a pixel
+    picture : Picture
+        the picture the function will be applied to
+
+    Returns
+    -------
+    list of Expr
+        expressions for the new red, green and blue levels, or None if the
+        function could not be traced
+    """
+    pixel = TracePixel(picture)
+    initial = list(pixel.levels)
+    refused = []
+
+    def watch(frame, event, arg):
+        # refuse calls that could have effects other than on the pixel;
+        # raising here stops the call from being made
+        if event == "call":
+            code = frame.f_code
+            if not _inPackage(code) and _storesState(code):
+                refused.append(code.co_name)
+                raise TraceError(code.co_name + "() cannot be traced")
+        elif event == "c_call" and arg not in _pureBuiltins \
+                and not _inPackage(frame.f_code):
+            refused.append(arg)
+            raise TraceError("calls to {} cannot be traced".format(arg))
+
+    picture._tracing = True
+    # make Pixel reads of the picture go through _readArray, which refuses
+    # them while tracing
+    picture._access = picture._writeAccess = None
+    profile = sys.getprofile()
+    sys.setprofile(watch)
+    try:
+        func(pixel)
+    except Exception:
+        return None
+    finally:
+        sys.setprofile(profile)
+        picture._tracing = False
+    if refused:
+        # the function caught the TraceError
+        return None
+    return [None if level is start else level
+        for level, start in zip(pixel.levels, initial)]
+
+def _evaluate(expr, array, memo):
+    """Return value of expr for every pixel of array
+
+    Parameters
+    ----------
+    expr : Expr or int
+        the expression
+    array : numpy.ndarray
+        the pixel array
+    memo : dict
+        values of expressions already evaluated, by id
+
+    Returns
+    -------
+    numpy.ndarray or number
+        the values, broadcastable to the picture's height and width
+    """
+    if not isinstance(expr, Expr):
+        return expr
+    value = memo.get(id(expr))
+    if value is not None:
+        return value
+    op = expr.op
+    if op == "level":
+        value = array[:, :, expr.args[0]].astype(np.int64)
+    elif op == "x":
+        value = np.arange(array.shape[1], dtype=np.int64)[np.newaxis, :]
+    elif op == "y":
+        value = np.arange(array.shape[0], dtype=np.int64)[:, np.newaxis]
+    elif op == "const":
+        value = expr.args[0]
+    elif op in _binaryOps:
+        left = _evaluate(expr.args[0], array, memo)
+        right = _evaluate(expr.args[1], array, memo)
+        value = _binaryOps[op](left, right)
+        if op in ("add", "sub", "mul", "pow") and \
+                np.asarray(value).dtype.kind in "iu":
+            _checkInt(op, left, right)
+    elif op == "neg":
+        value = np.negative(_evaluate(expr.args[0], array, memo))
+    elif op == "abs":
+        value = np.abs(_evaluate(expr.args[0], array, memo))
+    elif op == "round":
+        value = _toInt(np.rint(_evaluate(expr.args[0], array, memo)))
+    elif op == "correct":
+        # same steps as Pixel.correctLevel: truncate, then wrap or clamp
+        value = _toInt(np.trunc(_evaluate(expr.args[0], array, memo)))
+        if expr.args[1]:
+            value = np.mod(value, 256)
+        else:
+            value = np.clip(value, 0, 255)
+    else:
+        raise TraceError("unknown operation " + op)
+    memo[id(expr)] = value
+    return value
+
+def applyTrace(levels, array):
+    """Evaluate traced levels over a pixel array and store the results
+
+    Nothing is stored unless all levels evaluate without error to values
+    in [0..255].
+
+    Parameters
+    ----------
+    levels : list of Expr
+        expressions for the new red, green and blue levels, None for
+        levels that are unchanged
+    array : numpy.ndarray
+        the pixel array to update
+    """
+    height, width = array.shape[:2]
+    memo = {}
+    results = []
+    with np.errstate(all="raise"):
+        for channel, level in enumerate(levels):
+            if level is None:
+                continue
+            value = np.asarray(_evaluate(level, array, memo))
+            if value.dtype.kind not in "iu" or (value.size and
+                    (value.min() < 0 or value.max() > 255)):
+                raise TraceError("level is not in [0..255]")
+            results.append((channel, np.broadcast_to(value, (height, width))))
+    for channel, value in results:
+        array[:, :, channel] = value
@@ -0,0 +1,209 @@
+"""Module for styled text on pictures
+
+A TextStyle names a font family, emphasis and size, as made by
+media.makeStyle().  Loading a TrueType font means finding and parsing the
+font file, so loaded fonts are kept in a process-wide LRU cache.  Text that
+is drawn again and again, such as captions, labels and frame counters, is
+rendered once into a mask that is also cached, so drawing it again is a
+single paste.
+"""
+
+from collections import OrderedDict
+import PIL.Image, PIL.ImageDraw, PIL.ImageFont
+
+# Font families and emphasis, with the values JES uses
+sansSerif = "SansSerif"
+serif = "Serif"
+mono = "Monospaced"
+plain = 0
+bold = 1
+italic = 2
+
+# Font files to try for each family and emphasis, covering the fonts
+# usually found on Linux, Windows and macOS
+_fontFiles = {
+    (sansSerif, plain): ["DejaVuSans.ttf", "LiberationSans-Regular.ttf",
+        "arial.ttf", "Arial.ttf", "Helvetica.ttc"],
+    (sansSerif, bold): ["DejaVuSans-Bold.ttf", "LiberationSans-Bold.ttf",
+        "arialbd.ttf", "Arial Bold.ttf"],
+    (sansSerif, italic): ["DejaVuSans-Oblique.ttf",
+        "LiberationSans-Italic.ttf", "ariali.ttf", "Arial Italic.ttf"],
+    (sansSerif, bold + italic): ["DejaVuSans-BoldOblique.ttf",
+        "LiberationSans-BoldItalic.ttf", "arialbi.ttf",
+        "Arial Bold Italic.ttf"],
+    (serif, plain): ["DejaVuSerif.ttf", "LiberationSerif-Regular.ttf",
+        "times.ttf", "Times New Roman.ttf", "Times.ttc"],
+    (serif, bold): ["DejaVuSerif-Bold.ttf", "LiberationSerif-Bold.ttf",
+        "timesbd.ttf", "Times New Roman Bold.ttf"],
+    (serif, italic): ["DejaVuSerif-Italic.ttf", "LiberationSerif-Italic.ttf",
+        "timesi.ttf", "Times New Roman Italic.ttf"],
+    (serif, bold + italic): ["DejaVuSerif-BoldItalic.ttf",
+        "LiberationSerif-BoldItalic.ttf", "timesbi.ttf",
+        "Times New Roman Bold Italic.ttf"],
+    (mono, plain): ["DejaVuSansMono.ttf", "LiberationMono-Regular.ttf",
+        "cour.ttf", "Courier New.ttf", "Menlo.ttc"],
+    (mono, bold): ["DejaVuSansMono-Bold.ttf", "LiberationMono-Bold.ttf",
+        "courbd.ttf", "Courier New Bold.ttf"],
+    (mono, italic): ["DejaVuSansMono-Oblique.ttf",
+        "LiberationMono-Italic.ttf", "couri.ttf", "Courier New Italic.ttf"],
+    (mono, bold + italic): ["DejaVuSansMono-BoldOblique.ttf",
+        "LiberationMono-BoldItalic.ttf", "courbi.ttf",
+        "Courier New Bold Italic.ttf"],
+}
+
+class TextStyle:
+    """Font family, emphasis and size for drawing text
+
+    Attributes
+    ----------
+    family : str
+        sansSerif, serif, mono, or the name or path of a font file
+    emphasis : int
+        plain, bold, italic or bold + italic
+    size : int
+        the font size in pixels
+    fontCacheSize : int
+        (class attribute) the number of loaded fonts kept
+    textCacheSize : int
+        (class attribute) the number of rendered strings kept
+    """
+
+    __slots__ = ("family", "emphasis", "size")
+
+    fontCacheSize = 32
+    textCacheSize = 1024
+    _fonts = OrderedDict()
+    _texts = OrderedDict()
+
+    def __init__(self, family, emphasis, size):
+        """Initialize text style
+
+        Parameters
+        ----------
+        family : str
+            sansSerif, serif, mono, or the name or path of a font file
+        emphasis : int
+            plain, bold, italic or bold + italic
+        size : int
+            the font size in pixels
+        """
+        self.family = family
+        self.emphasis = emphasis
+        self.size = size
+
+    def __repr__(self):
+        """Representation of text style
+
+        Returns
+        -------
+        str
+            string showing family, emphasis and size
+        """
+        return "TextStyle({!r}, {}, {})".format(self.family, self.emphasis,
+            self.size)
+
+    def __eq__(self, other):
+        if not isinstance(other, TextStyle):
+            return NotImplemented
+        return (self.family, self.emphasis, self.size) == \
+            (other.family, other.emphasis, other.size)
+
+    def __hash__(self):
+        return hash((self.family, self.emphasis, self.size))
+
+    def getFont(self):
+        """Return the font for this style, loading it if it is not cached
+
+        Families with no font file on this computer use Pillow's default
+        font at the same size.
+
+        Returns
+        -------
+        PIL.ImageFont.FreeTypeFont
+            the font
+        """
+        key = (self.family, self.emphasis, self.size)
+        fonts = TextStyle._fonts
+        font = fonts.get(key)
+        if font is not None:
+            fonts.move_to_end(key)
+            return font
+        font = _loadFont(self.family, self.emphasis, self.size)
+        fonts[key] = font
+        if len(fonts) > TextStyle.fontCacheSize:
+            fonts.popitem(last=False)
+        return font
+
+    @staticmethod
+    def renderText(string, font=None):
+        """Return a mask with string rendered in font
+
+        Masks are cached by string and font, so repeated strings are only
+        rendered once.
+
+        Parameters
+        ----------
+        string : str
+            the text
+        font : PIL.ImageFont.FreeTypeFont
+            the font, or None for Pillow's default font
+
+        Returns
+        -------
+        tuple
+            the "L" mode mask, or None for text that draws nothing, and the
+            offset of its upper-left corner from the text position
+        """
+        key = (string, font)
+        texts = TextStyle._texts
+        entry = texts.get(key)
+        if entry is not None:
+            texts.move_to_end(key)
+            return entry
+        left, top, right, bottom = PIL.ImageDraw.Draw(
+            PIL.Image.new("L", (1, 1))).textbbox((0, 0), string, font=font)
+        mask = None
+        if right > left and bottom > top:
+            mask = PIL.Image.new("L", (right - left, bottom - top))
+            PIL.ImageDraw.Draw(mask).text((-left, -top), string, 255,
+                font=font)
+        entry = (mask, (left, top))
+        texts[key] = entry
+        if len(texts) > TextStyle.textCacheSize:
+            texts.popitem(last=False)
+        return entry
+
+    @staticmethod
+    def clearCaches():
+        """Empty the caches of loaded fonts and rendered text"""
+        TextStyle._fonts.clear()
+        TextStyle._texts.clear()
+
+def _loadFont(family, emphasis, size):
+    """Load a TrueType font
+
+    Parameters
+    ----------
+    family : str
+        sansSerif, serif, mono, or the name or path of a font file
+    emphasis : int
+        plain, bold, italic or bold + italic
+    size : int
+        the font size in pixels
+
+    Returns
+    -------
+    PIL.ImageFont.FreeTypeFont
+        the font
+    """
+    names = _fontFiles.get((family, emphasis), [family])
+    for name in names:
+        try:
+            return PIL.ImageFont.truetype(name, size)
+        except OSError:
+            pass
+    try:
+        return PIL.ImageFont.load_default(size)
+    except TypeError:
+        # Pillow before 10.1 has only the fixed size bitmap font
+        return PIL.ImageFont.load_default()
@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+
+"""
+bench_drawing.py - compare per-call drawing with a batched drawing context
+
+Draws the same random line segments, filled rectangles and points on a
+picture three ways: with the media.add* functions, with a loop of
+single-shape calls inside "with pic.drawing() as d", and with the bulk
+array methods of the drawing batch.  Reports the time for each and checks
+that all three pictures come out identical.
+
+Usage: python bench_drawing.py [count]
+"""
+
+import sys
+import time
+import numpy as np
+from jes4py.media import *
+
+def drawPerCall(pic, segments, rects, points, color):
+    for x1, y1, x2, y2 in segments:
+        addLine(pic, x1, y1, x2, y2, color)
+    for x, y, w, h in rects:
+        addRectFilled(pic, x, y, w, h, color)
+    for x, y in points:
+        addLine(pic, x, y, x, y, color)
+
+def drawBatchLoop(pic, segments, rects, points, color):
+    with pic.drawing() as d:
+        for x1, y1, x2, y2 in segments:
+            d.addLine(color, x1, y1, x2, y2)
+        for x, y, w, h in rects:
+            d.addRectFilled(color, x, y, w, h)
+        for x, y in points:
+            d.addLine(color, x, y, x, y)
+
+def drawBatchBulk(pic, segments, rects, points, color):
+    with pic.drawing() as d:
+        d.addLines(color, segments)
+        d.addRectsFilled(color, rects)
+        d.addPoints(color, points)
+
+def main(argv):
+    count = int(argv[1]) if len(argv) > 1 else 100000
+    width, height = 800, 600
+    rng = np.random.default_rng(2024)
+    segments = np.column_stack([rng.integers(0, width, count),
+        rng.integers(0, height, count), rng.integers(0, width, count),
+        rng.integers(0, height, count)])
+    rects = np.column_stack([rng.integers(0, width, count // 10),
+        rng.integers(0, height, count // 10),
+        rng.integers(1, 20, count // 10), rng.integers(1, 20, count // 10)])
+    points = np.column_stack([rng.integers(0, width, count),
+        rng.integers(0, height, count)])
+    # the per-call functions take plain ints
+    lists = (segments.tolist(), rects.tolist(), points.tolist())
+    color = makeColor(200, 30, 60)
+    print("{} lines, {} rectangles, {} points".format(count, count // 10,
+        count))
+    results = []
+    for name, func, args in [("per call", drawPerCall, lists),
+            ("batch loop", drawBatchLoop, lists),
+            ("batch bulk", drawBatchBulk, (segments, rects, points))]:
+        pic = makeEmptyPicture(width, height)
+        start = time.perf_counter()
+        func(pic, *args, color)
+        elapsed = time.perf_counter() - start
+        results.append((name, elapsed, pic.getArray().copy()))
+    base = results[0][1]
+    for name, elapsed, array in results:
+        print("{:<12}{:>10.3f} s{:>8.1f}x  same={}".format(name, elapsed,
+            base / elapsed, np.array_equal(array, results[0][2])))
+
+if __name__ == '__main__':
+    main(sys.argv)
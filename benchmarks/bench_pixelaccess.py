@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+
+"""
+bench_pixelaccess.py - compare per-pixel read and write paths
+
+Times the original Pixel implementation, which called getpixel() and
+putpixel() on the PIL image for every channel access, against the Pixel
+methods in jes4py.PixelColor, which index the picture's cached pixel
+access handle.
+
+Usage: python bench_pixelaccess.py [width height]
+"""
+
+import sys
+import time
+from jes4py.Picture import Picture
+from jes4py.PixelColor import Pixel, Color
+
+def oldGetRed(image, x, y):
+    rgb = image.getpixel((x, y))
+    return rgb[0]
+
+def oldSetRed(image, x, y, value):
+    value = Pixel.correctLevel(value)
+    color = Color(image.getpixel((x, y)))
+    newColor = (value, color.getGreen(), color.getBlue())
+    image.putpixel((x, y), newColor)
+
+def oldGetColor(image, x, y):
+    return Color(image.getpixel((x, y)))
+
+def oldSetColor(image, x, y, color):
+    image.putpixel((x, y), color.getRGB())
+
+def runOld(pic):
+    """Run the old paths over every pixel of pic
+
+    Returns
+    -------
+    dict
+        seconds taken by each operation
+    """
+    image = pic.getImage()
+    width, height = image.size
+    color = Color(10, 20, 30)
+    times = {}
+    start = time.perf_counter()
+    for y in range(height):
+        for x in range(width):
+            oldGetRed(image, x, y)
+    times["getRed"] = time.perf_counter() - start
+    start = time.perf_counter()
+    for y in range(height):
+        for x in range(width):
+            oldSetRed(image, x, y, 100)
+    times["setRed"] = time.perf_counter() - start
+    start = time.perf_counter()
+    for y in range(height):
+        for x in range(width):
+            oldGetColor(image, x, y)
+    times["getColor"] = time.perf_counter() - start
+    start = time.perf_counter()
+    for y in range(height):
+        for x in range(width):
+            oldSetColor(image, x, y, color)
+    times["setColor"] = time.perf_counter() - start
+    return times
+
+def runNew(pic):
+    """Run the current Pixel methods over every pixel of pic
+
+    Returns
+    -------
+    dict
+        seconds taken by each operation
+    """
+    width, height = pic.getWidth(), pic.getHeight()
+    pixels = [[pic.getPixel(x, y) for x in range(width)]
+        for y in range(height)]
+    color = Color(10, 20, 30)
+    times = {}
+    start = time.perf_counter()
+    for row in pixels:
+        for p in row:
+            p.getRed()
+    times["getRed"] = time.perf_counter() - start
+    start = time.perf_counter()
+    for row in pixels:
+        for p in row:
+            p.setRed(100)
+    times["setRed"] = time.perf_counter() - start
+    start = time.perf_counter()
+    for row in pixels:
+        for p in row:
+            p.getColor()
+    times["getColor"] = time.perf_counter() - start
+    start = time.perf_counter()
+    for row in pixels:
+        for p in row:
+            p.setColor(color)
+    times["setColor"] = time.perf_counter() - start
+    return times
+
+def main(argv):
+    width, height = (int(argv[1]), int(argv[2])) if len(argv) > 2 \
+        else (500, 500)
+    old = runOld(Picture(width, height))
+    new = runNew(Picture(width, height))
+    print("{}x{} picture, ns per pixel".format(width, height))
+    print("{:<12}{:>12}{:>12}{:>10}".format("operation", "old", "new",
+        "speedup"))
+    for op in old:
+        n = width * height
+        print("{:<12}{:>12.1f}{:>12.1f}{:>9.1f}x".format(op,
+            old[op] / n * 1e9, new[op] / n * 1e9, old[op] / new[op]))
+
+if __name__ == '__main__':
+    main(sys.argv)
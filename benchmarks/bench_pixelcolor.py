@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+
+"""
+bench_pixelcolor.py - measure memory use and construction time of Pixel
+                      and Color objects
+
+Compares the slotted Pixel and Color classes in jes4py.PixelColor with
+dict-backed classes that construct objects the way they used to be
+constructed (config lookup per Pixel, three correctLevel calls per Color).
+
+Usage: python bench_pixelcolor.py [count]
+"""
+
+import sys
+import timeit
+import tracemalloc
+from jes4py import Config
+from jes4py.Picture import Picture
+from jes4py.PixelColor import Pixel, Color
+
+class DictPixel:
+    """Dict-backed pixel constructed like the original Pixel class"""
+    def __init__(self, picture=None, x=None, y=None):
+        self.wrapLevels = Config.getConfigVal("CONFIG_WRAPPIXELVALUES")
+        self.picture = picture
+        self.x = x
+        self.y = y
+
+class DictColor:
+    """Dict-backed color constructed like the original Color class"""
+    def __init__(self, r, g=None, b=None):
+        if b == None or g == None:
+            self.color = r
+        else:
+            r = Pixel.correctLevel(r)
+            g = Pixel.correctLevel(g)
+            b = Pixel.correctLevel(b)
+            self.color = (r, g, b)
+
+def bytesPerObject(factory, count):
+    """Return average number of bytes allocated per object made by factory
+
+    Parameters
+    ----------
+    factory : callable
+        called with an int to create one object
+    count : int
+        number of objects to create
+
+    Returns
+    -------
+    float
+        bytes allocated per object
+    """
+    tracemalloc.start()
+    before = tracemalloc.get_traced_memory()[0]
+    objects = [factory(i) for i in range(count)]
+    after = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    del objects
+    return (after - before) / count
+
+def secondsPerObject(factory, count):
+    """Return best average time in seconds to create one object
+
+    Parameters
+    ----------
+    factory : callable
+        called with an int to create one object
+    count : int
+        number of objects to create per timing run
+
+    Returns
+    -------
+    float
+        seconds per object
+    """
+    timer = timeit.Timer(lambda: [factory(i) for i in range(count)])
+    return min(timer.repeat(repeat=5, number=1)) / count
+
+def main(argv):
+    count = int(argv[1]) if len(argv) > 1 else 100000
+    pic = Picture(100, 100)
+    rgb = (12, 34, 56)
+    cases = [
+        ("Pixel(pic, x, y)", lambda i: DictPixel(pic, i, i),
+            lambda i: Pixel(pic, i, i)),
+        ("Color(r, g, b)", lambda i: DictColor(12, 34, 56),
+            lambda i: Color(12, 34, 56)),
+        ("Color from RGB tuple", lambda i: DictColor(rgb),
+            lambda i: Color._fromRGB(rgb)),
+    ]
+    print("{} objects per run".format(count))
+    print("{:<22}{:>12}{:>12}{:>12}{:>12}".format("case", "old bytes",
+        "new bytes", "old ns", "new ns"))
+    for name, old, new in cases:
+        print("{:<22}{:>12.1f}{:>12.1f}{:>12.1f}{:>12.1f}".format(name,
+            bytesPerObject(old, count), bytesPerObject(new, count),
+            secondsPerObject(old, count) * 1e9,
+            secondsPerObject(new, count) * 1e9))
+
+if __name__ == '__main__':
+    main(sys.argv)
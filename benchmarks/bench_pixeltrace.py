@@ -0,0 +1,51 @@
+#!/usr/bin/env python3
+
+"""
+bench_pixeltrace.py - compare traced and per-pixel runs of JES exercises
+
+Runs the per-pixel exercises in tests/pixelExercises.py both with
+Picture.applyPixelFunction and with a plain loop over getPixels().  For
+each exercise it reports whether the function was traced and the time
+taken by each run.  tests/test_pixeltrace.py checks that both give the
+same pictures.
+
+Usage: python bench_pixeltrace.py [width height]
+"""
+
+import os, sys
+import time
+import numpy as np
+from jes4py.media import *
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)),
+    os.pardir, "tests"))
+from pixelExercises import exercises
+
+def main(argv):
+    width, height = (int(argv[1]), int(argv[2])) if len(argv) > 2 \
+        else (320, 240)
+    rng = np.random.default_rng(2024)
+    levels = rng.integers(0, 256, (height, width, 3), dtype=np.uint8)
+    print("{}x{} picture".format(width, height))
+    print("{:<14}{:>8}{:>12}{:>12}{:>10}".format("exercise", "traced",
+        "loop s", "traced s", "speedup"))
+    for func in exercises:
+        loopPic = makeEmptyPicture(width, height)
+        loopPic.setArray(levels.copy())
+        start = time.perf_counter()
+        for px in getPixels(loopPic):
+            func(px)
+        loopTime = time.perf_counter() - start
+
+        tracedPic = makeEmptyPicture(width, height)
+        tracedPic.setArray(levels.copy())
+        start = time.perf_counter()
+        traced = applyPixelFunction(tracedPic, func)
+        tracedTime = time.perf_counter() - start
+
+        print("{:<14}{:>8}{:>12.4f}{:>12.4f}{:>9.1f}x".format(
+            func.__name__, str(traced), loopTime, tracedTime,
+            loopTime / tracedTime))
+
+if __name__ == '__main__':
+    main(sys.argv)
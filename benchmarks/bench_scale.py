@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+
+"""
+bench_scale.py - time Picture.scale with each resampling filter
+
+Scales a random picture by common factors with each resample option of
+Picture.scale and reports the time per call in milliseconds.  Exact
+integer shrink factors use the Image.reduce fast path with the default
+and "box" filters; the "resize box" column times Image.resize with the
+box filter for comparison.
+
+Usage: python bench_scale.py [width height]
+"""
+
+import sys
+import timeit
+import numpy as np
+import PIL.Image
+from jes4py.Picture import Picture
+
+filters = [None, "nearest", "box", "bilinear", "bicubic", "lanczos"]
+factors = [0.5, 0.25, 0.125, 0.3, 0.75, 2.0]
+
+def msPerCall(func):
+    """Return best time in milliseconds for one call of func"""
+    timer = timeit.Timer(func)
+    return min(timer.repeat(repeat=5, number=1)) * 1e3
+
+def main(argv):
+    width, height = (int(argv[1]), int(argv[2])) if len(argv) > 2 \
+        else (2000, 1500)
+    rng = np.random.default_rng(2024)
+    pic = Picture(width, height)
+    pic.setArray(rng.integers(0, 256, (height, width, 3), dtype=np.uint8))
+    image = pic.getImage()
+    print("{}x{} picture, ms per scale".format(width, height))
+    print("{:<8}".format("factor") + "".join("{:>10}".format(str(f))
+        for f in filters) + "{:>12}".format("resize box"))
+    for factor in factors:
+        row = "{:<8}".format(factor)
+        for f in filters:
+            row += "{:>10.2f}".format(msPerCall(lambda:
+                pic.scale(factor, factor, f)))
+        size = (int(width * factor), int(height * factor))
+        row += "{:>12.2f}".format(msPerCall(lambda:
+            image.resize(size, PIL.Image.BOX)))
+        print(row)
+
+if __name__ == '__main__':
+    main(sys.argv)
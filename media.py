@@ -12,12 +12,14 @@ import sys
 import os
 import math
 from jes4py.Picture import Picture
-from jes4py.PixelColor import Pixel, Color
+from jes4py.PixelColor import Pixel, PixelSequence, Color
+from jes4py.TextStyle import TextStyle, sansSerif, serif, mono, plain, bold, italic
 from jes4py.Sound import Sound
 from jes4py.Sample import Sample
 from jes4py.Samples import Samples
 from jes4py import FileChooser
 import random
+import numpy as np
 from jes4py import Config
 
 # Support a media shortcut
@@ -366,6 +368,18 @@ def getIndex(sample):
 # Globals for styled text
 ##
 
+def makeStyle(fontName, emphasis, size):
+    if not isinstance(fontName, str):
+        print("makeStyle(fontName, emphasis, size): First input is not a string")
+        raise ValueError
+    if emphasis not in (plain, bold, italic, bold + italic):
+        print("makeStyle(fontName, emphasis, size): Second input is not plain, bold, italic or bold + italic")
+        raise ValueError
+    if not isinstance(size, int) or size < 1:
+        print("makeStyle(fontName, emphasis, size): Last input is not a positive integer")
+        raise ValueError
+    return TextStyle(fontName, emphasis, size)
+
 
 ##
 # Global color functions
@@ -411,25 +425,75 @@ cyan = Color(0, 255, 255)
 
 
 def randomPixels(somePic, number):
-    pixellist = []
-    pixels = getPixels(somePic)
-    for count in range(number):
-        pixellist.append(random.choice(pixels))
+    if not isinstance(somePic, Picture):
+        print("randomPixels(somePic, number): First input is not a picture")
+        raise ValueError
+    # sample pixel positions directly rather than building every pixel
+    size = getWidth(somePic) * getHeight(somePic)
+    pixellist = PixelSequence(somePic, random.choices(range(size), k=number))
     explore(pixelsToPicture(pixellist))
 
 
+def _pixelArrays(pixels):
+    # Return arrays of the x and y coordinates and the RGB levels of pixels
+    if isinstance(pixels, PixelSequence):
+        indices = pixels.indices
+        if isinstance(indices, range):
+            flat = np.arange(indices.start, indices.stop, indices.step)
+        else:
+            flat = np.array(indices, dtype=np.intp)
+        ys, xs = np.divmod(flat, pixels.width)
+        return xs, ys, pixels.picture._readArray()[ys, xs, :3]
+    # gather coordinates, numbering the pictures the pixels come from
+    pictures = []
+    codes = {}
+    pictureCodes, xs, ys = [], [], []
+    for pixel in pixels:
+        if not isinstance(pixel, Pixel):
+            print("pixelsToPicture(pixels): Input contains something that is not a pixel")
+            raise ValueError
+        code = codes.get(id(pixel.picture))
+        if code is None:
+            code = codes[id(pixel.picture)] = len(pictures)
+            pictures.append(pixel.picture)
+        pictureCodes.append(code)
+        xs.append(pixel.x)
+        ys.append(pixel.y)
+    pictureCodes = np.array(pictureCodes, dtype=np.intp)
+    xs = np.array(xs, dtype=np.intp)
+    ys = np.array(ys, dtype=np.intp)
+    # gather colors with one lookup per source picture
+    colors = np.empty((len(xs), 3), dtype=np.uint8)
+    for code, picture in enumerate(pictures):
+        mask = pictureCodes == code
+        colors[mask] = picture._readArray()[ys[mask], xs[mask], :3]
+    return xs, ys, colors
+
+
 def pixelsToPicture(pixels, defaultColor=white, maxX=100, maxY=100):
-    maxX = max([getX(p) for p in pixels])
-    maxY = max([getY(p) for p in pixels])
+    xs, ys, colors = _pixelArrays(pixels)
+    if len(xs) == 0:
+        print("pixelsToPicture(pixels): Input has no pixels")
+        raise ValueError
+    maxX = int(xs.max())
+    maxY = int(ys.max())
     newpic = makeEmptyPicture(maxX + 1, maxY + 1, defaultColor)
-    for pixel in pixels:
-        x = getX(pixel)
-        y = getY(pixel)
-        setColor(getPixel(newpic, x, y), getColor(pixel))
+    # when a position occurs more than once the last pixel wins, as it
+    # would if the pixels were set one at a time
+    flat = ys * (maxX + 1) + xs
+    last = len(flat) - 1 - np.unique(flat[::-1], return_index=True)[1]
+    newpic._writeArray()[ys[last], xs[last]] = colors[last]
     return newpic
 
 
-def makePicture(filename, defaultColor=white):
+def makePicture(filename, defaultColor=white, lazy=False, size=None,
+        maxDimension=None):
+    """returns the picture in a file (see Picture.loadOrFail)
+
+    Decoded pictures are only cached for loading the same file again after
+    opting in by setting the CONFIG_PICTURE_CACHE_BYTES configuration
+    value to the cache size in bytes; by default nothing is cached.
+    """
     global mediaFolder
     if not isinstance(filename, str):
         return pixelsToPicture(filename, defaultColor=defaultColor)
@@ -439,9 +503,17 @@ def makePicture(filename, defaultColor=white):
         print("makePicture(filename): There is no file at " + filename)
         raise ValueError
     picture = Picture()
-    picture.loadOrFail(filename)
+    picture.loadOrFail(filename, lazy, size, maxDimension)
     return picture
 
+
+def clearPictureCache():
+    Picture.clearPictureCache()
+
+
+def getPictureCacheStats():
+    return Picture.getPictureCacheStats()
+
 # MMO (1 Dec 2005): Capped width/height to max 10000 and min 1
 # alexr (6 Sep 2006): fixed to work without the Python classes.
 # PamC (6 July 2007): added new optional param to allow for empty pictures
@@ -470,6 +542,13 @@ def getAllPixels(picture):
     return getPixels(picture)
 
 
+def iterPixels(picture):
+    if not isinstance(picture, Picture):
+        print("iterPixels(picture): Input is not a picture")
+        raise ValueError
+    return picture.iterPixels()
+
+
 def getWidth(picture):
     if not isinstance(picture, Picture):
         print("getWidth(picture): Input is not a picture")
@@ -496,6 +575,12 @@ def repaint(picture):
         raise ValueError
     picture.repaint()
 
+def getShowStats(picture):
+    if not isinstance(picture, Picture):
+        print("getShowStats(picture): Input is not a picture")
+        raise ValueError
+    return picture.getShowStats()
+
 ## adding graphics to your pictures! ##
 
 
@@ -519,6 +604,17 @@ def addText(picture, x, y, string, acolor=black):
     picture.addText(acolor, x, y, string)
 
 # PamC: Added this function to allow different font styles
+def addTextWithStyle(picture, x, y, string, style, acolor=black):
+    if not isinstance(picture, Picture):
+        print("addTextWithStyle(picture, x, y, string, style[, color]): First input is not a picture")
+        raise ValueError
+    if not isinstance(style, TextStyle):
+        print("addTextWithStyle(picture, x, y, string, style[, color]): Input is not a style (see makeStyle)")
+        raise ValueError
+    if not isinstance(acolor, Color):
+        print("addTextWithStyle(picture, x, y, string, style[, color]): Last input is not a color")
+        raise ValueError
+    picture.addTextWithStyle(acolor, x, y, string, style)
 
 # - JRS -- 2020-06-23 -- START OF MODIFICATIONS
 
@@ -611,7 +707,6 @@ def getPixelAt(picture, x, y):
 
 
 def setRed(pixel, value):
-    value = Pixel.correctLevel(value)
     if not isinstance(pixel, Pixel):
         print("setRed(pixel,value): Input is not a pixel")
         raise ValueError
@@ -626,7 +721,6 @@ def getRed(pixel):
 
 
 def setBlue(pixel, value):
-    value = Pixel.correctLevel(value)
     if not isinstance(pixel, Pixel):
         print("setBlue(pixel,value): Input is not a pixel")
         raise ValueError
@@ -641,7 +735,6 @@ def getBlue(pixel):
 
 
 def setGreen(pixel, value):
-    value = Pixel.correctLevel(value)
     if not isinstance(pixel, Pixel):
         print("setGreen(pixel,value): Input is not a pixel")
         raise ValueError
@@ -659,7 +752,7 @@ def getColor(pixel):
     if not isinstance(pixel, Pixel):
         print("getColor(pixel): Input is not a pixel")
         raise ValueError
-    return Color(pixel.getColor())
+    return pixel.getColor()
 
 
 def setColor(pixel, color):
@@ -748,8 +841,71 @@ def setAllPixelsToAColor(picture, color):
     picture.setAllPixelsToAColor(color)
 
 
-# Alyce Brady's version of copyInto, with additional error-checking on the upper-left corner
+def applyPixelFunction(picture, func):
+    if not isinstance(picture, Picture):
+        print("applyPixelFunction(picture, func): First input is not a picture")
+        raise ValueError
+    if not callable(func):
+        print("applyPixelFunction(picture, func): Second input is not a function")
+        raise ValueError
+    return picture.applyPixelFunction(func)
+
+
+def parallelMap(picture, func, workers=None, channels=False):
+    if not isinstance(picture, Picture):
+        print("parallelMap(picture, func[, workers, channels]): First input is not a picture")
+        raise ValueError
+    if not callable(func):
+        print("parallelMap(picture, func[, workers, channels]): Second input is not a function")
+        raise ValueError
+    picture.parallelMap(func, workers, channels)
+
+
+def mapChannels(picture, redFunc=None, greenFunc=None, blueFunc=None):
+    if not isinstance(picture, Picture):
+        print("mapChannels(picture[, redFunc, greenFunc, blueFunc]): First input is not a picture")
+        raise ValueError
+    for func in (redFunc, greenFunc, blueFunc):
+        if func is not None and not callable(func):
+            print("mapChannels(picture[, redFunc, greenFunc, blueFunc]): Channel input is not a function")
+            raise ValueError
+    picture.mapChannels(redFunc, greenFunc, blueFunc)
+
+
+def mapRed(picture, func):
+    if not isinstance(picture, Picture):
+        print("mapRed(picture, func): First input is not a picture")
+        raise ValueError
+    if not callable(func):
+        print("mapRed(picture, func): Second input is not a function")
+        raise ValueError
+    picture.mapRed(func)
+
+
+def mapGreen(picture, func):
+    if not isinstance(picture, Picture):
+        print("mapGreen(picture, func): First input is not a picture")
+        raise ValueError
+    if not callable(func):
+        print("mapGreen(picture, func): Second input is not a function")
+        raise ValueError
+    picture.mapGreen(func)
+
+
+def mapBlue(picture, func):
+    if not isinstance(picture, Picture):
+        print("mapBlue(picture, func): First input is not a picture")
+        raise ValueError
+    if not callable(func):
+        print("mapBlue(picture, func): Second input is not a function")
+        raise ValueError
+    picture.mapBlue(func)
+
+
+# Alyce Brady's version of copyInto
 # Will copy as much of the original picture into the destination picture as will fit.
+# The upper-left corner may lie outside destPict (e.g. be negative); the parts of
+# origPict that fall outside destPict are clipped.
 def copyInto(origPict, destPict, upperLeftX, upperLeftY):
  if not isinstance(origPict, Picture):
    print("copyInto(origPict, destPict, upperLeftX, upperLeftY): First parameter is not a picture")
@@ -757,12 +913,6 @@ def copyInto(origPict, destPict, upperLeftX, upperLeftY):
  if not isinstance(destPict, Picture):
    print("copyInto(origPict, destPict, upperLeftX, upperLeftY): Second parameter is not a picture")
    raise ValueError
- if upperLeftX < 0 or upperLeftX > getWidth(destPict):
-   print("copyInto(origPict, destPict, upperLeftX, upperLeftY): upperLeftX must be within the destPict")
-   raise ValueError
- if upperLeftY < 0 or upperLeftY > getHeight(destPict):
-   print("copyInto(origPict, destPict, upperLeftX, upperLeftY): upperLeftY must be within the destPict")
-   raise ValueError
  return origPict.copyInto(destPict, upperLeftX-1, upperLeftY-1)
 
 
@@ -777,10 +927,10 @@ def cropPicture(picture, upperLeftX, upperLeftY, width, height):
  if not isinstance(picture, Picture):
    print("crop(picture, upperLeftX, upperLeftY, width, height): First parameter is not a picture")
    raise ValueError
- if upperLeftX < 1 or upperLeftX > getWidth(pic):
+ if upperLeftX < 1 or upperLeftX > getWidth(picture):
    print("crop(picture, upperLeftX, upperLeftY, width, height): upperLeftX must be within the picture")
    raise ValueError
- if upperLeftY < 1 or upperLeftY > getHeight(pic):
+ if upperLeftY < 1 or upperLeftY > getHeight(picture):
    print("crop(picture, upperLeftX, upperLeftY, width, height): upperLeftY must be within the picture")
    raise ValueError
  return picture.crop(upperLeftX-1, upperLeftY-1, width, height)
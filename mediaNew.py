@@ -40,12 +40,14 @@ import matplotlib.pyplot as plt
 import pygame.midi
 import time
 from jes4py.Picture import Picture
-from jes4py.PixelColor import Pixel, Color
+from jes4py.PixelColor import Pixel, PixelSequence, Color
+from jes4py.TextStyle import TextStyle, sansSerif, serif, mono, plain, bold, italic
 from jes4py.Sound import Sound
 from jes4py.Sample import Sample
 from jes4py.Samples import Samples
 from jes4py import FileChooser
 import random
+import numpy as np
 from jes4py import Config
 
 mediaFolder = os.getcwd() + os.sep
@@ -390,25 +392,75 @@ cyan = Color(0, 255, 255)
 
 
 def randomPixels(somePic, number):
-    pixellist = []
-    pixels = getPixels(somePic)
-    for count in range(number):
-        pixellist.append(random.choice(pixels))
+    if not isinstance(somePic, Picture):
+        print("randomPixels(somePic, number): First input is not a picture")
+        raise ValueError
+    # sample pixel positions directly rather than building every pixel
+    size = getWidth(somePic) * getHeight(somePic)
+    pixellist = PixelSequence(somePic, random.choices(range(size), k=number))
     explore(pixelsToPicture(pixellist))
 
 
+def _pixelArrays(pixels):
+    # Return arrays of the x and y coordinates and the RGB levels of pixels
+    if isinstance(pixels, PixelSequence):
+        indices = pixels.indices
+        if isinstance(indices, range):
+            flat = np.arange(indices.start, indices.stop, indices.step)
+        else:
+            flat = np.array(indices, dtype=np.intp)
+        ys, xs = np.divmod(flat, pixels.width)
+        return xs, ys, pixels.picture._readArray()[ys, xs, :3]
+    # gather coordinates, numbering the pictures the pixels come from
+    pictures = []
+    codes = {}
+    pictureCodes, xs, ys = [], [], []
+    for pixel in pixels:
+        if not isinstance(pixel, Pixel):
+            print("pixelsToPicture(pixels): Input contains something that is not a pixel")
+            raise ValueError
+        code = codes.get(id(pixel.picture))
+        if code is None:
+            code = codes[id(pixel.picture)] = len(pictures)
+            pictures.append(pixel.picture)
+        pictureCodes.append(code)
+        xs.append(pixel.x)
+        ys.append(pixel.y)
+    pictureCodes = np.array(pictureCodes, dtype=np.intp)
+    xs = np.array(xs, dtype=np.intp)
+    ys = np.array(ys, dtype=np.intp)
+    # gather colors with one lookup per source picture
+    colors = np.empty((len(xs), 3), dtype=np.uint8)
+    for code, picture in enumerate(pictures):
+        mask = pictureCodes == code
+        colors[mask] = picture._readArray()[ys[mask], xs[mask], :3]
+    return xs, ys, colors
+
+
 def pixelsToPicture(pixels, defaultColor=white, maxX=100, maxY=100):
-    maxX = max([getX(p) for p in pixels])
-    maxY = max([getY(p) for p in pixels])
+    xs, ys, colors = _pixelArrays(pixels)
+    if len(xs) == 0:
+        print("pixelsToPicture(pixels): Input has no pixels")
+        raise ValueError
+    maxX = int(xs.max())
+    maxY = int(ys.max())
     newpic = makeEmptyPicture(maxX + 1, maxY + 1, defaultColor)
-    for pixel in pixels:
-        x = getX(pixel)
-        y = getY(pixel)
-        setColor(getPixel(newpic, x, y), getColor(pixel))
+    # when a position occurs more than once the last pixel wins, as it
+    # would if the pixels were set one at a time
+    flat = ys * (maxX + 1) + xs
+    last = len(flat) - 1 - np.unique(flat[::-1], return_index=True)[1]
+    newpic._writeArray()[ys[last], xs[last]] = colors[last]
     return newpic
 
 
-def makePicture(filename, defaultColor=white):
+def makePicture(filename, defaultColor=white, lazy=False, size=None,
+        maxDimension=None):
+    """returns the picture in a file (see Picture.loadOrFail)
+
+    Decoded pictures are only cached for loading the same file again after
+    opting in by setting the CONFIG_PICTURE_CACHE_BYTES configuration
+    value to the cache size in bytes; by default nothing is cached.
+    """
     global mediaFolder
     if not isinstance(filename, str):
         return pixelsToPicture(filename, defaultColor=defaultColor)
@@ -418,10 +470,18 @@ def makePicture(filename, defaultColor=white):
         print("makePicture(filename): There is no file at " + filename)
         raise ValueError
     picture = Picture()
-    picture.loadOrFail(filename)
+    picture.loadOrFail(filename, lazy, size, maxDimension)
     return picture
 
 
+def clearPictureCache():
+    Picture.clearPictureCache()
+
+
+def getPictureCacheStats():
+    return Picture.getPictureCacheStats()
+
+
 def makeEmptyPicture(width, height, acolor=white):
     if width > 10000 or height > 10000:
         print("makeEmptyPicture(width, height[, acolor]): height and width must be less than 10000 each")
@@ -444,6 +504,13 @@ def getAllPixels(picture):
     return getPixels(picture)
 
 
+def iterPixels(picture):
+    if not isinstance(picture, Picture):
+        print("iterPixels(picture): Input is not a picture")
+        raise ValueError
+    return picture.iterPixels()
+
+
 def getWidth(picture):
     if not isinstance(picture, Picture):
         print("getWidth(picture): Input is not a picture")
@@ -470,6 +537,12 @@ def repaint(picture):
         raise ValueError
     picture.repaint()
 
+def getShowStats(picture):
+    if not isinstance(picture, Picture):
+        print("getShowStats(picture): Input is not a picture")
+        raise ValueError
+    return picture.getShowStats()
+
 
 def addLine(picture, x1, y1, x2, y2, acolor=black):
     if not isinstance(picture, Picture):
@@ -492,6 +565,32 @@ def addText(picture, x, y, string, acolor=black):
     picture.addText(acolor, x, y, string)
 
 
+def makeStyle(fontName, emphasis, size):
+    if not isinstance(fontName, str):
+        print("makeStyle(fontName, emphasis, size): First input is not a string")
+        raise ValueError
+    if emphasis not in (plain, bold, italic, bold + italic):
+        print("makeStyle(fontName, emphasis, size): Second input is not plain, bold, italic or bold + italic")
+        raise ValueError
+    if not isinstance(size, int) or size < 1:
+        print("makeStyle(fontName, emphasis, size): Last input is not a positive integer")
+        raise ValueError
+    return TextStyle(fontName, emphasis, size)
+
+
+def addTextWithStyle(picture, x, y, string, style, acolor=black):
+    if not isinstance(picture, Picture):
+        print("addTextWithStyle(picture, x, y, string, style[, color]): First input is not a picture")
+        raise ValueError
+    if not isinstance(style, TextStyle):
+        print("addTextWithStyle(picture, x, y, string, style[, color]): Input is not a style (see makeStyle)")
+        raise ValueError
+    if not isinstance(acolor, Color):
+        print("addTextWithStyle(picture, x, y, string, style[, color]): Last input is not a color")
+        raise ValueError
+    picture.addTextWithStyle(acolor, x, y, string, style)
+
+
 def addRect(picture, x, y, w, h, acolor=black):
     if not isinstance(picture, Picture):
         print("addRect(picture, x, y, w, h[, color]): First input is not a picture")
@@ -571,7 +670,6 @@ def getPixelAt(picture, x, y):
 
 
 def setRed(pixel, value):
-    value = Pixel.correctLevel(value)
     if not isinstance(pixel, Pixel):
         print("setRed(pixel,value): Input is not a pixel")
         raise ValueError
@@ -586,7 +684,6 @@ def getRed(pixel):
 
 
 def setBlue(pixel, value):
-    value = Pixel.correctLevel(value)
     if not isinstance(pixel, Pixel):
         print("setBlue(pixel,value): Input is not a pixel")
         raise ValueError
@@ -601,7 +698,6 @@ def getBlue(pixel):
 
 
 def setGreen(pixel, value):
-    value = Pixel.correctLevel(value)
     if not isinstance(pixel, Pixel):
         print("setGreen(pixel,value): Input is not a pixel")
         raise ValueError
@@ -619,7 +715,7 @@ def getColor(pixel):
     if not isinstance(pixel, Pixel):
         print("getColor(pixel): Input is not a pixel")
         raise ValueError
-    return Color(pixel.getColor())
+    return pixel.getColor()
 
 
 def setColor(pixel, color):
@@ -705,6 +801,67 @@ def setAllPixelsToAColor(picture, color):
     picture.setAllPixelsToAColor(color)
 
 
+def applyPixelFunction(picture, func):
+    if not isinstance(picture, Picture):
+        print("applyPixelFunction(picture, func): First input is not a picture")
+        raise ValueError
+    if not callable(func):
+        print("applyPixelFunction(picture, func): Second input is not a function")
+        raise ValueError
+    return picture.applyPixelFunction(func)
+
+
+def parallelMap(picture, func, workers=None, channels=False):
+    if not isinstance(picture, Picture):
+        print("parallelMap(picture, func[, workers, channels]): First input is not a picture")
+        raise ValueError
+    if not callable(func):
+        print("parallelMap(picture, func[, workers, channels]): Second input is not a function")
+        raise ValueError
+    picture.parallelMap(func, workers, channels)
+
+
+def mapChannels(picture, redFunc=None, greenFunc=None, blueFunc=None):
+    if not isinstance(picture, Picture):
+        print("mapChannels(picture[, redFunc, greenFunc, blueFunc]): First input is not a picture")
+        raise ValueError
+    for func in (redFunc, greenFunc, blueFunc):
+        if func is not None and not callable(func):
+            print("mapChannels(picture[, redFunc, greenFunc, blueFunc]): Channel input is not a function")
+            raise ValueError
+    picture.mapChannels(redFunc, greenFunc, blueFunc)
+
+
+def mapRed(picture, func):
+    if not isinstance(picture, Picture):
+        print("mapRed(picture, func): First input is not a picture")
+        raise ValueError
+    if not callable(func):
+        print("mapRed(picture, func): Second input is not a function")
+        raise ValueError
+    picture.mapRed(func)
+
+
+def mapGreen(picture, func):
+    if not isinstance(picture, Picture):
+        print("mapGreen(picture, func): First input is not a picture")
+        raise ValueError
+    if not callable(func):
+        print("mapGreen(picture, func): Second input is not a function")
+        raise ValueError
+    picture.mapGreen(func)
+
+
+def mapBlue(picture, func):
+    if not isinstance(picture, Picture):
+        print("mapBlue(picture, func): First input is not a picture")
+        raise ValueError
+    if not callable(func):
+        print("mapBlue(picture, func): Second input is not a function")
+        raise ValueError
+    picture.mapBlue(func)
+
+
 def copyInto(origPict, destPict, upperLeftX, upperLeftY):
  if not isinstance(origPict, Picture):
    print("copyInto(origPict, destPict, upperLeftX, upperLeftY): First parameter is not a picture")
@@ -712,12 +869,6 @@ def copyInto(origPict, destPict, upperLeftX, upperLeftY):
  if not isinstance(destPict, Picture):
    print("copyInto(origPict, destPict, upperLeftX, upperLeftY): Second parameter is not a picture")
    raise ValueError
- if upperLeftX < 0 or upperLeftX > getWidth(destPict):
-   print("copyInto(origPict, destPict, upperLeftX, upperLeftY): upperLeftX must be within the destPict")
-   raise ValueError
- if upperLeftY < 0 or upperLeftY > getHeight(destPict):
-   print("copyInto(origPict, destPict, upperLeftX, upperLeftY): upperLeftY must be within the destPict")
-   raise ValueError
  return origPict.copyInto(destPict, upperLeftX-1, upperLeftY-1)
 
 
@@ -732,10 +883,10 @@ def cropPicture(picture, upperLeftX, upperLeftY, width, height):
  if not isinstance(picture, Picture):
    print("crop(picture, upperLeftX, upperLeftY, width, height): First parameter is not a picture")
    raise ValueError
- if upperLeftX < 1 or upperLeftX > getWidth(pic):
+ if upperLeftX < 1 or upperLeftX > getWidth(picture):
    print("crop(picture, upperLeftX, upperLeftY, width, height): upperLeftX must be within the picture")
    raise ValueError
- if upperLeftY < 1 or upperLeftY > getHeight(pic):
+ if upperLeftY < 1 or upperLeftY > getHeight(picture):
    print("crop(picture, upperLeftX, upperLeftY, width, height): upperLeftY must be within the picture")
    raise ValueError
  return picture.crop(upperLeftX-1, upperLeftY-1, width, height)
@@ -22,8 +22,23 @@ subprocess and uses a pipe to send a pickled picture object to the subprocess.
 The repaint() method checks to make sure a subprocess for this picture object
 is currently running and then sends the pickled updated picture object.
 
-This script expects the initial byte of data to be 0 (to exit) or 1
-(a pickled picture object follows).
+This script expects the initial byte of data to be 0 (to exit), 1 (a
+pickled picture object follows), 2 (a frame message follows) or 3 (a
+rectangles message follows).  Messages after the control byte are an 8-byte
+length followed by pickled data.  A frame message is the tuple (name,
+width, height, channels, count, title): the picture's pixels are in the
+shared memory block called name, after a header of
+Picture.show_frame_header bytes whose first 8 bytes hold the number of
+frames written so far (odd while a frame is being written).  A rectangles
+message adds a list of (left, top, right, bottom) rectangles to the tuple;
+only the pixels in those rectangles have changed since the last frame.
+
+Frames are painted from one bitmap that is reused while the picture keeps
+its size.  When frames arrive faster than they can be painted only the
+newest is painted.  After painting a frame this script stores the numbers
+of frames received, displayed and dropped and the latency of the frame in
+the header of the shared memory block, where Picture.getShowStats() reads
+them.
 
 Implementation note: The thread portion of this program is based on the
 first example at https://wiki.wxpython.org/LongRunningTasks.  The pickling
@@ -32,8 +47,10 @@ https://www.imagetracking.org.uk/2018/03/piping-numpy-arrays-to-other-processes-
 """
 
 import wx
-import sys, os
+import sys, os, time
 import pickle
+import numpy as np
+from multiprocessing import shared_memory
 from threading import *
 from jes4py import *
 
@@ -53,7 +70,20 @@ class MessageEvent(wx.PyEvent):
 
 # Thread class that executes processing
 class Listener(Thread):
-    """Listener Thread Class"""
+    """Listener Thread Class
+
+    Only the newest message waits to be handled by the window.  When
+    frames arrive faster than the window draws them, a new message replaces
+    the waiting one, which is counted as dropped; the changed rectangles
+    of dropped rectangles messages are added to the new message's.
+
+    Attributes
+    ----------
+    received : int
+        the number of frame messages received
+    dropped : int
+        the number of frame messages replaced before they were handled
+    """
     def __init__(self, notifyWindow):
         """Initializer for Listener Thread Class
 
@@ -64,6 +94,10 @@ class Listener(Thread):
         """
         Thread.__init__(self)
         self.notifyWindow = notifyWindow
+        self.lock = Lock()
+        self.pending = None
+        self.received = 0
+        self.dropped = 0
         self.start()
 
     def run(self):
@@ -75,19 +109,60 @@ class Listener(Thread):
                 # shutdown program
                 wx.PostEvent(self.notifyWindow, MessageEvent(None))
                 return
-            elif data == Picture.show_control_data:
-                # read picture size and pickled picture data
+            elif data in (Picture.show_control_data,
+                    Picture.show_control_frame, Picture.show_control_rects):
+                # read message size and pickled message
                 try:
+                    code = data
                     data = sys.stdin.buffer.read(8)
                     dataLen = int.from_bytes(data, byteorder='big')
                     pkg = sys.stdin.buffer.read(dataLen)
-                    wx.PostEvent(self.notifyWindow, MessageEvent(pkg))
+                    self.postMessage(code, pickle.loads(pkg))
                 except RuntimeError:
                     return
             else:
                 # unrecognised control code
                 return
 
+    def postMessage(self, code, message):
+        """Make a message the one waiting, notifying the window if needed
+
+        Parameters
+        ----------
+        code : bytes
+            the control code of the message
+        message : Picture or tuple
+            the unpickled message
+        """
+        with self.lock:
+            pending = self.pending
+            if code != Picture.show_control_data:
+                self.received += 1
+            if pending is not None:
+                if pending[0] != Picture.show_control_data:
+                    self.dropped += 1
+                if code == Picture.show_control_rects:
+                    if pending[0] == code and pending[1][0] == message[0]:
+                        message = message[:6] + (pending[1][6] + message[6],)
+                    else:
+                        # the waiting message needed more than rectangles
+                        code, message = Picture.show_control_frame, message[:6]
+            self.pending = (code, message)
+        if pending is None:
+            wx.PostEvent(self.notifyWindow, MessageEvent(True))
+
+    def takeMessage(self):
+        """Return the waiting message and its control code
+
+        Returns
+        -------
+        tuple
+            the control code and message, or None if no message is waiting
+        """
+        with self.lock:
+            pending, self.pending = self.pending, None
+        return pending
+
 class MainWindow(wx.Frame):
     """Window class for show program
     """
@@ -102,16 +177,33 @@ class MainWindow(wx.Frame):
         """
         super(MainWindow, self).__init__(parent=parent)
 
-        # Set up listener for data coming in over pipe
-        self.Connect(-1, -1, wx.ID_ANY, self.OnMessage)
-        self.worker = Listener(self)
+        # Shared memory holding the frames, once the first one arrives
+        self.frameMemory = None
+
+        # Bitmap of the displayed frame and the rectangles of it still to
+        # be read from shared memory (None for the whole frame)
+        self.frameBitmap = None
+        self.frameAlpha = False
+        self.pendingRects = None
 
-        # Create panel for displayed window
+        # Frames displayed, and frames skipped because they were
+        # overwritten while being read
+        self.displayed = 0
+        self.skipped = 0
+        self.totalLatency = 0
+
+        # Create panel the frames are painted on
         self.panel = wx.Panel(parent=self)
+        self.panel.SetBackgroundStyle(wx.BG_STYLE_PAINT)
+        self.panel.Bind(wx.EVT_PAINT, self.OnPaint)
         self.sizer = wx.BoxSizer(wx.VERTICAL)
         self.sizer.Add(self.panel, 0, wx.ALIGN_LEFT|wx.ALIGN_TOP|wx.ALL, 0)
         self.SetSizerAndFit(self.sizer)
 
+        # Set up listener for data coming in over pipe
+        self.Connect(-1, -1, wx.ID_ANY, self.OnMessage)
+        self.worker = Listener(self)
+
     def OnMessage(self, event):
         """Handle received message
 
@@ -121,15 +213,110 @@ class MainWindow(wx.Frame):
             the event object
 
         event.data is either None (to indicate request to terminate program)
-        or a pickled Picture object
+        or True when the listener has a message waiting
         """
         if event.data is None:
             # all done
+            if self.frameMemory is not None:
+                self.frameMemory.close()
             self.Close()
+            return
+        message = self.worker.takeMessage()
+        if message is None:
+            return
+        code, data = message
+        if code == Picture.show_control_data:
+            self.updateBitmap(data)
+        else:
+            self.updateFrame(*data)
+
+    def OnPaint(self, event):
+        """Paint the displayed frame
+
+        Parameters
+        ----------
+        event : wx.PaintEvent
+            the event object
+        """
+        if self.frameBitmap is None:
+            wx.PaintDC(self.panel)
+        else:
+            wx.BufferedPaintDC(self.panel, self.frameBitmap)
+
+    def updateFrame(self, name, width, height, channels, count, title,
+            rects=None):
+        """Update displayed image from a frame in shared memory
+
+        Frames that are overwritten while they are being read are skipped,
+        since the message for the newer frame follows; their rectangles
+        are read along with that frame's.
+
+        Parameters
+        ----------
+        name : str
+            name of the shared memory block holding the frame
+        width, height : int
+            size of the frame
+        channels : int
+            3 for RGB pixels, 4 for RGBA pixels
+        count : int
+            number of frames written, including this one
+        title : str
+            title of the picture
+        rects : list of tuple
+            left, top, right and bottom (exclusive) of the rectangles that
+            changed since the last frame, or None if the whole frame did
+        """
+        if self.frameMemory is None or self.frameMemory.name != name:
+            if self.frameMemory is not None:
+                self.frameMemory.close()
+                self.frameMemory = None
+            try:
+                self.frameMemory = attachSharedMemory(name)
+            except FileNotFoundError:
+                # replaced and removed already; wait for the next frame
+                self.pendingRects = None
+                self.skipped += 1
+                return
+            # let the parent remove the buffers used before this one
+            attached = np.ndarray((8,), dtype=np.uint64,
+                buffer=self.frameMemory.buf)
+            attached[7] = 1
+            del attached
+            self.pendingRects = None
+        if rects is None or self.frameBitmap is None \
+                or self.frameBitmap.GetSize() != (width, height):
+            self.pendingRects = None
+        elif self.pendingRects is not None:
+            self.pendingRects.extend(rects)
+        buf = self.frameMemory.buf
+        header = np.ndarray((7,), dtype=np.uint64, buffer=buf)
+        if header[0] != count:
+            self.skipped += 1
+            return
+        sent = int(header[1])
+        start = Picture.show_frame_header
+        frame = np.frombuffer(buf, dtype=np.uint8,
+            count=width * height * channels,
+            offset=start).reshape(height, width, channels)
+        if self.pendingRects is None:
+            pixels = frame.copy()
         else:
-            # unpickle data and update displayed image
-            picture = pickle.loads(event.data)
-            self.updateBitmap(picture)
+            pieces = [(box, frame[box[1]:box[3], box[0]:box[2]].copy())
+                for box in self.pendingRects]
+        if header[0] != count:
+            self.skipped += 1
+            return
+        if self.pendingRects is None:
+            self.showPixels(pixels, title)
+        else:
+            self.blitRects(pieces, title)
+        self.pendingRects = []
+        latency = max(time.monotonic_ns() - sent, 0)
+        self.displayed += 1
+        self.totalLatency += latency
+        header[2:] = (self.worker.received, self.displayed,
+            self.worker.dropped + self.skipped, latency, self.totalLatency)
 
     def updateBitmap(self, picture):
         """Update bitmap of displayed image
@@ -139,14 +326,93 @@ class MainWindow(wx.Frame):
         picture : Picture object
             picture to display
         """
-        image = picture.getWxImage()
-        imageSize = image.GetSize()
-        bmp = wx.Bitmap(image)
-        self.SetTitle(picture.getTitle())
-        self.bitmap = wx.StaticBitmap(parent=self.panel, size=imageSize, \
-                                        bitmap=bmp)
-        self.SetClientSize(imageSize)
-        self.Refresh()
+        self.pendingRects = None
+        self.showPixels(np.ascontiguousarray(picture.getArray()),
+            picture.getTitle())
+
+    def showPixels(self, pixels, title):
+        """Display a whole frame
+
+        The pixels are copied into the bitmap of the last frame when it
+        has the same size and format.
+
+        Parameters
+        ----------
+        pixels : numpy.ndarray
+            uint8 array of shape (height, width, 3) for RGB pixels or
+            (height, width, 4) for RGBA pixels
+        title : str
+            the window title
+        """
+        height, width, channels = pixels.shape
+        alpha = channels == 4
+        bitmap = self.frameBitmap
+        if bitmap is not None and bitmap.GetSize() == (width, height) \
+                and self.frameAlpha == alpha:
+            bitmap.CopyFromBuffer(pixels.tobytes(),
+                wx.BitmapBufferFormat_RGBA if alpha
+                else wx.BitmapBufferFormat_RGB)
+        else:
+            if alpha:
+                self.frameBitmap = wx.Bitmap.FromBufferRGBA(width, height,
+                    pixels.tobytes())
+            else:
+                self.frameBitmap = wx.Bitmap.FromBuffer(width, height,
+                    pixels.tobytes())
+            self.frameAlpha = alpha
+            self.panel.SetMinSize((width, height))
+            self.panel.SetSize((width, height))
+            self.SetClientSize((width, height))
+        if self.GetTitle() != title:
+            self.SetTitle(title)
+        self.panel.Refresh(eraseBackground=False)
+        self.panel.Update()
+
+    def blitRects(self, pieces, title):
+        """Draw changed rectangles into the displayed image
+
+        Parameters
+        ----------
+        pieces : list of tuple
+            the (left, top, right, bottom) of each rectangle and a NumPy
+            array with its RGB pixels
+        title : str
+            the window title
+        """
+        dc = wx.MemoryDC(self.frameBitmap)
+        for (left, top, right, bottom), pixels in pieces:
+            dc.DrawBitmap(wx.Bitmap.FromBuffer(right - left, bottom - top,
+                pixels[:, :, :3].tobytes()), left, top)
+        dc.SelectObject(wx.NullBitmap)
+        for (left, top, right, bottom), pixels in pieces:
+            self.panel.RefreshRect(wx.Rect(left, top, right - left,
+                bottom - top), eraseBackground=False)
+        if self.GetTitle() != title:
+            self.SetTitle(title)
+        self.panel.Update()
+
+def attachSharedMemory(name):
+    """Map a shared memory block created by the parent process
+
+    Parameters
+    ----------
+    name : str
+        name of the shared memory block
+
+    Returns
+    -------
+    multiprocessing.shared_memory.SharedMemory
+        the mapped block
+    """
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        # before Python 3.13 the block is always registered with this
+        # process's resource tracker, which would remove it on exit
+        from multiprocessing import resource_tracker
+        shm = shared_memory.SharedMemory(name=name)
+        resource_tracker.unregister(shm._name, "shared_memory")
+        return shm
 
 # ===========================================================================
 # Main program
@@ -0,0 +1,96 @@
+"""Per-pixel exercises from "Introduction to Computing and Programming in
+Python: A Multimedia Approach", used by test_pixeltrace.py and
+benchmarks/bench_pixeltrace.py
+"""
+
+from jes4py.media import *
+
+def decreaseRed(px):
+    setRed(px, getRed(px) * 0.5)
+
+def increaseRed(px):
+    setRed(px, getRed(px) * 1.2)
+
+def clearBlue(px):
+    setBlue(px, 0)
+
+def makeSunset(px):
+    setBlue(px, getBlue(px) * 0.7)
+    setGreen(px, getGreen(px) * 0.7)
+
+def negative(px):
+    setColor(px, makeColor(255 - getRed(px), 255 - getGreen(px),
+        255 - getBlue(px)))
+
+def grayScale(px):
+    intensity = (getRed(px) + getGreen(px) + getBlue(px)) / 3
+    setColor(px, makeColor(intensity, intensity, intensity))
+
+def grayScaleNew(px):
+    luminance = getRed(px) * 0.299 + getGreen(px) * 0.587 \
+        + getBlue(px) * 0.114
+    setColor(px, makeColor(luminance, luminance, luminance))
+
+def averageGray(px):
+    level = px.getAverage()
+    setColor(px, makeColor(level))
+
+def swapRedBlue(px):
+    setRed(px, getBlue(px))
+    setBlue(px, getRed(px) * 0.8)
+
+def copyColor(px):
+    setColor(px, getColor(px))
+
+def darken(px):
+    setColor(px, makeDarker(getColor(px)))
+
+def gradient(px):
+    setRed(px, getX(px) % 256)
+    setGreen(px, getY(px) // 2)
+
+def roundedHalf(px):
+    setGreen(px, round(getGreen(px) / 2))
+
+def wrapBrighten(px):
+    setColorWrapAround(True)
+    setRed(px, getRed(px) + 100)
+    setColorWrapAround(False)
+
+# The following branch on levels or convert them, so they are not traced
+
+def lighten(px):
+    setColor(px, makeLighter(getColor(px)))
+
+def sepiaTint(px):
+    red = getRed(px)
+    blue = getBlue(px)
+    if red < 63:
+        red = red * 1.1
+        blue = blue * 0.9
+    elif red < 192:
+        red = red * 1.15
+        blue = blue * 0.85
+    else:
+        red = min(red * 1.08, 255)
+        blue = blue * 0.93
+    setBlue(px, blue)
+    setRed(px, red)
+
+def posterize(px):
+    red = getRed(px)
+    if red < 64:
+        setRed(px, 31)
+    elif red < 128:
+        setRed(px, 95)
+    else:
+        setRed(px, 223)
+
+def intHalf(px):
+    setRed(px, int(getRed(px) / 2))
+
+tracedExercises = [decreaseRed, increaseRed, clearBlue, makeSunset,
+    negative, grayScale, grayScaleNew, averageGray, swapRedBlue, copyColor,
+    darken, gradient, roundedHalf, wrapBrighten]
+untracedExercises = [lighten, sepiaTint, posterize, intHalf]
+exercises = tracedExercises + untracedExercises
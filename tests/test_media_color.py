@@ -0,0 +1,26 @@
+"""Tests for colors returned by the media functions"""
+
+import pytest
+
+from jes4py.media import *
+
+def test_shared_color_cannot_change():
+    pic = makeEmptyPicture(2, 1, makeColor(10, 20, 30))
+    first = getColor(getPixel(pic, 0, 0))
+    second = getColor(getPixel(pic, 1, 0))
+    for color in (first, first + black, first - black, first.makeDarker(),
+            first.scaleColor(1.0)):
+        with pytest.raises(ValueError):
+            color.setRGB(1, 2, 3)
+    assert second.getRGB() == (10, 20, 30)
+    assert getColor(getPixel(pic, 1, 0)).getRGB() == (10, 20, 30)
+
+def test_new_color_can_change():
+    pic = makeEmptyPicture(2, 1, makeColor(10, 20, 30))
+    color = Color(getColor(getPixel(pic, 0, 0)))
+    color.setRGB(1, 2, 3)
+    assert color.getRGB() == (1, 2, 3)
+    assert getColor(getPixel(pic, 1, 0)).getRGB() == (10, 20, 30)
+    made = makeColor(4, 5, 6)
+    made.setRGB(7, 8, 9)
+    assert made.getRGB() == (7, 8, 9)
@@ -0,0 +1,69 @@
+"""Tests for writes through arrays returned by Picture.getArray()"""
+
+import os
+import numpy as np
+from jes4py.Picture import Picture
+from jes4py.PixelColor import Color
+from jes4py.media import makeEmptyPicture, getPixels, pixelsToPicture
+
+def readBack(fileName):
+    return np.array(Picture(fileName).getImage())
+
+def test_write_mutate_write(tmp_path):
+    pic = Picture(10, 10, Color(255, 255, 255))
+    array = pic.getArray()
+    for i in range(3):
+        array[...] = i * 50
+        fileName = os.path.join(str(tmp_path), "frame{}.png".format(i))
+        pic.write(fileName)
+        assert (readBack(fileName) == i * 50).all()
+
+def test_mutate_after_sync_then_draw(tmp_path):
+    pic = Picture(10, 10, Color(255, 255, 255))
+    array = pic.getArray()
+    pic.write(os.path.join(str(tmp_path), "before.png"))
+    array[...] = 5
+    assert pic.getPixel(0, 0).getRed() == 5
+    pic.addLine(Color(0, 0, 0), 5, 0, 5, 9)
+    assert pic.getPixel(0, 0).getColor().getRGB() == (5, 5, 5)
+    assert pic.getPixel(5, 5).getColor().getRGB() == (0, 0, 0)
+
+def test_mutate_after_sync_then_copy(tmp_path):
+    pic = Picture(10, 10, Color(255, 255, 255))
+    array = pic.getArray()
+    pic.write(os.path.join(str(tmp_path), "before.png"))
+    array[1, 1] = 7
+    assert pic.scale(1, 1).getPixel(1, 1).getRed() == 7
+    assert pic.crop(0, 0, 3, 3).getPixel(1, 1).getRed() == 7
+    dest = Picture(10, 10)
+    pic.copyInto(dest, 0, 0)
+    assert dest.getPixel(1, 1).getRed() == 7
+
+def test_mutate_after_pyramid():
+    pic = Picture(16, 16, Color(255, 255, 255))
+    array = pic.getArray()
+    pic.buildPyramid()
+    array[...] = 100
+    assert (np.array(pic.scale(0.5, 0.5).getImage()) == 100).all()
+
+def test_set_array_is_adopted(tmp_path):
+    levels = np.zeros((4, 6, 3), dtype=np.uint8)
+    pic = Picture(1, 1)
+    pic.setArray(levels)
+    pic.write(os.path.join(str(tmp_path), "before.png"))
+    levels[2, 3] = (1, 2, 3)
+    assert np.array(pic.getImage())[2, 3].tolist() == [1, 2, 3]
+
+def test_view_array(tmp_path):
+    pic = Picture(10, 10, Color(255, 255, 255))
+    view = pic.view(2, 2, 4, 4)
+    array = view.getArray()
+    pic.write(os.path.join(str(tmp_path), "before.png"))
+    array[...] = 3
+    assert np.array(pic.getImage())[2, 2].tolist() == [3, 3, 3]
+
+def test_pixels_to_picture_does_not_export():
+    src = makeEmptyPicture(3, 2, Color(10, 20, 30))
+    pic = pixelsToPicture(getPixels(src))
+    assert not pic._arrayExported
+    assert pic.getPixel(2, 1).getColor().getRGB() == (10, 20, 30)
@@ -0,0 +1,35 @@
+"""Tests for the cache of decoded pictures"""
+
+import os
+from jes4py import Config
+from jes4py.Picture import Picture
+from jes4py.PixelColor import Color
+
+def savedPicture(tmp_path):
+    fileName = os.path.join(str(tmp_path), "pic.png")
+    Picture(8, 6, Color(1, 2, 3)).write(fileName)
+    return fileName
+
+def load(fileName):
+    pic = Picture()
+    pic.loadOrFail(fileName)
+    return pic
+
+def test_cache_off_by_default(tmp_path):
+    fileName = savedPicture(tmp_path)
+    Picture.clearPictureCache()
+    load(fileName)
+    load(fileName)
+    assert Picture.getPictureCacheStats()["entries"] == 0
+
+def test_cache_opt_in(tmp_path, monkeypatch):
+    monkeypatch.setitem(Config.CONFIG_DICT, "CONFIG_PICTURE_CACHE_BYTES",
+        1024 * 1024)
+    fileName = savedPicture(tmp_path)
+    Picture.clearPictureCache()
+    first = load(fileName)
+    second = load(fileName)
+    assert Picture.getPictureCacheStats()["entries"] == 1
+    second.getPixel(0, 0).setRed(200)
+    assert first.getPixel(0, 0).getRed() == 1
+    Picture.clearPictureCache()
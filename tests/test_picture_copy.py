@@ -0,0 +1,36 @@
+"""Tests for copies of pictures that share their image until changed"""
+
+import os
+import PIL.Image
+import pytest
+from jes4py.media import *
+
+@pytest.mark.parametrize("mode", ["RGB", "RGBA"])
+def test_duplicate_after_pixel_write(mode, tmp_path):
+    src = Picture(PIL.Image.new(mode, (4, 4), (10, 20, 30, 255)[:len(mode)]))
+    setRed(getPixel(src, 0, 0), 50)
+    cp = duplicatePicture(src)
+    setRed(getPixel(src, 1, 1), 200)
+    assert getRed(getPixel(cp, 1, 1)) == 10
+    assert getRed(getPixel(cp, 0, 0)) == 50
+    fileName = os.path.join(str(tmp_path), "copy.png")
+    cp.write(fileName)
+    assert PIL.Image.open(fileName).getpixel((1, 1))[0] == 10
+
+@pytest.mark.parametrize("mode", ["RGB", "RGBA"])
+def test_duplicate_after_array_write(mode):
+    src = Picture(PIL.Image.new(mode, (4, 4), (10, 20, 30, 255)[:len(mode)]))
+    src.getArray()[0, 0, 0] = 50
+    cp = duplicatePicture(src)
+    src.getArray()[1, 1, 0] = 200
+    assert getRed(getPixel(cp, 1, 1)) == 10
+    assert getRed(getPixel(cp, 0, 0)) == 50
+
+@pytest.mark.parametrize("mode", ["RGB", "RGBA"])
+def test_copy_changes_independently(mode):
+    src = Picture(PIL.Image.new(mode, (4, 4), (10, 20, 30, 255)[:len(mode)]))
+    cp = duplicatePicture(src)
+    addLine(cp, 0, 0, 3, 0, red)
+    setBlue(getPixel(cp, 2, 2), 99)
+    assert getColor(getPixel(src, 0, 0)).getRGB() == (10, 20, 30)
+    assert getBlue(getPixel(src, 2, 2)) == 30
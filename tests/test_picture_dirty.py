@@ -0,0 +1,32 @@
+"""Tests for the regions of a shown picture recorded as changed"""
+
+from jes4py.Picture import Picture, _cellRects
+from jes4py.PixelColor import Color
+
+def recording(width, height):
+    pic = Picture(width, height, Color(0, 0, 0))
+    pic._dirtyRects = []
+    pic._dirtyCells = set()
+    return pic
+
+def test_pixel_writes_record_cells():
+    pic = recording(300, 200)
+    pic.getPixel(3, 3).setRed(1)
+    pic.getPixel(130, 70).setGreen(1)
+    pic.getPixel(131, 71).setColor(Color(1, 2, 3))
+    pic.view(250, 150, 50, 50).getPixel(10, 20).setBlue(1)
+    assert pic._dirtyCells == {(0, 0), (1, 2), (2, 4)}
+    assert pic._dirtyRects == []
+    assert pic._writeAccess is None
+
+def test_array_writes_mark_regions():
+    pic = recording(300, 200)
+    pic.view(10, 20, 30, 40).setArray(pic.view(0, 0, 30, 40).getArray())
+    assert pic._dirtyRects[-1] == (10, 20, 40, 60)
+    pic.applyPixelFunction(lambda px: px.setRed(5))
+    assert pic._dirtyRects is None
+
+def test_cell_rects():
+    cells = {(0, 0), (0, 1), (0, 3), (1, 4), (3, 4)}
+    assert _cellRects(cells, 300, 200) == [(0, 0, 128, 64),
+        (192, 0, 256, 64), (256, 64, 300, 128), (256, 192, 300, 200)]
@@ -0,0 +1,16 @@
+"""Tests for Picture.scale"""
+
+import PIL.Image
+import pytest
+from jes4py.Picture import Picture
+
+@pytest.mark.parametrize("mode", ["RGB", "RGBA", "L", "P", "1", "I;16"])
+def test_halve_any_mode(mode):
+    pic = Picture(PIL.Image.new(mode, (20, 10)))
+    half = pic.scale(0.5, 0.5)
+    assert (half.getWidth(), half.getHeight()) == (10, 5)
+
+def test_width_and_height_of_palette_picture():
+    pic = Picture(PIL.Image.new("P", (40, 20)))
+    assert pic.getPictureWithWidth(20).getHeight() == 10
+    assert pic.getPictureWithHeight(5).getWidth() == 10
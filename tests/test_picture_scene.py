@@ -0,0 +1,41 @@
+"""Tests for drawing recorded in a scene"""
+
+from jes4py.media import *
+
+def drawFrame(pic, t):
+    if t % 3 == 0:
+        setColor(getPixel(pic, 1, 1), red)
+    addRectFilled(pic, 2, 2, 10, 10, blue)
+    if t % 2 == 0:
+        setColor(getPixel(pic, 5, 5), red)
+        setRed(getPixel(pic, 15 + t % 3, 15), 7)
+    addOvalFilled(pic, t, 4, 6, 6, green)
+    addLine(pic, 0, 5, 19, 5, yellow)
+
+def colors(pic):
+    return [getColor(px).getRGB() for px in getPixels(pic)]
+
+def test_scene_matches_immediate_drawing():
+    background = makeEmptyPicture(20, 20, gray)
+    pic = duplicatePicture(background)
+    pic.beginScene()
+    for t in range(6):
+        if t > 0:
+            pic.newFrame()
+        drawFrame(pic, t)
+        expected = duplicatePicture(background)
+        drawFrame(expected, t)
+        assert colors(pic) == colors(expected)
+    pic.endScene()
+    assert colors(pic) == colors(expected)
+
+def test_scene_keeps_pixel_writes_in_frame():
+    pic = makeEmptyPicture(20, 20, gray)
+    pic.beginScene()
+    addRectFilled(pic, 0, 0, 20, 10, blue)
+    setColor(getPixel(pic, 3, 15), red)
+    addRectFilled(pic, 0, 0, 5, 5, green)
+    pic.endScene()
+    assert getColor(getPixel(pic, 3, 15)).getRGB() == red.getRGB()
+    assert getColor(getPixel(pic, 8, 8)).getRGB() == blue.getRGB()
+    assert getColor(getPixel(pic, 1, 1)).getRGB() == green.getRGB()
@@ -0,0 +1,122 @@
+"""Tests for tracing pixel functions with Picture.applyPixelFunction"""
+
+import random
+import numpy as np
+import pytest
+from jes4py.media import *
+from pixelExercises import tracedExercises, untracedExercises
+
+def randomPicture(width=30, height=20, seed=2024):
+    levels = np.random.default_rng(seed).integers(0, 256, (height, width, 3),
+        dtype=np.uint8)
+    pic = makeEmptyPicture(width, height)
+    pic.setArray(levels)
+    return pic
+
+def loopResult(func, pic):
+    for px in getPixels(pic):
+        func(px)
+    return pic.getArray()
+
+@pytest.mark.parametrize("func", tracedExercises + untracedExercises)
+def test_exercise_matches_loop(func):
+    expected = loopResult(func, randomPicture())
+    pic = randomPicture()
+    assert applyPixelFunction(pic, func) == (func in tracedExercises)
+    assert np.array_equal(pic.getArray(), expected)
+
+# Functions whose result is not the same pure function of every pixel
+
+def addNoise(px):
+    setRed(px, getRed(px) + random.randint(-20, 20))
+
+def makeCounter():
+    count = [0]
+    def countPixels(px):
+        count[0] += 1
+        setRed(px, count[0] % 256)
+    return countPixels
+
+def makeNonlocalCounter():
+    count = 0
+    def countPixels(px):
+        nonlocal count
+        count += 1
+        setRed(px, count % 256)
+    return countPixels
+
+def hugePower(px):
+    setRed(px, getRed(px) ** 10)
+
+def hugeDifference(px):
+    setRed(px, (getRed(px) + 1) ** 40 - 10)
+
+def makeRecorder():
+    reds = []
+    def recordRed(px):
+        reds.append(getRed(px))
+        setBlue(px, 0)
+    return recordRed
+
+def makeSetRecorder():
+    seen = set()
+    def recordColor(px):
+        seen.add(getRed(px))
+        setBlue(px, 0)
+    return recordColor
+
+class Counter:
+    def __init__(self):
+        self.count = 0
+
+    def inc(self):
+        self.count += 1
+        return self.count
+
+def makeMethodCounter():
+    counter = Counter()
+    def countPixels(px):
+        setRed(px, counter.inc() % 256)
+    return countPixels
+
+def printRed(px):
+    print(getRed(px))
+    setBlue(px, 0)
+
+@pytest.mark.parametrize("makeFunc", [lambda: addNoise, makeCounter,
+    makeNonlocalCounter, lambda: hugePower, lambda: hugeDifference,
+    makeRecorder, makeSetRecorder, makeMethodCounter, lambda: printRed])
+def test_not_traced(makeFunc):
+    random.seed(1)
+    expected = loopResult(makeFunc(), randomPicture())
+    random.seed(1)
+    pic = randomPicture()
+    assert not applyPixelFunction(pic, makeFunc())
+    assert np.array_equal(pic.getArray(), expected)
+
+def test_side_effects_run_per_pixel(capsys):
+    reds = []
+    def recordRed(px):
+        reds.append(getRed(px))
+        setBlue(px, 0)
+    pic = randomPicture(10, 10)
+    expected = [getRed(px) for px in getPixels(pic)]
+    assert not applyPixelFunction(pic, recordRed)
+    assert reds == expected
+
+    counter = Counter()
+    def countPixels(px):
+        setRed(px, counter.inc() % 256)
+    assert not applyPixelFunction(randomPicture(10, 10), countPixels)
+    assert counter.count == 100
+
+    capsys.readouterr()
+    assert not applyPixelFunction(randomPicture(2, 2), printRed)
+    assert "Expr" not in capsys.readouterr().out
+
+def test_changing_trace_not_used():
+    values = iter(range(1000))
+    def nextValue(px):
+        setRed(px, next(values))
+    pic = randomPicture(4, 3)
+    assert not applyPixelFunction(pic, nextValue)